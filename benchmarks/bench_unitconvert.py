@@ -0,0 +1,48 @@
+# benchmarks/bench_unitconvert.py
+"""
+Per-conversion latency of /convert, before and after the memoized fast path.
+
+"before" is the conversion the cog used to do on every call: parse the unit
+strings and convert through pint. "after" is UnitConverter.convert once the
+pair's scale and offset are cached. Run from the repository root:
+
+    python -m benchmarks.bench_unitconvert [--number N]
+"""
+import argparse
+import time
+import timeit
+from flvrbot.units import UnitConverter
+
+PAIRS = [
+    ("km", "mile"),
+    ("pound", "kilogram"),
+    ("degree_Fahrenheit", "degree_Celsius"),
+    ("km/h", "mph"),
+    ("gallon", "liter"),
+]
+
+def per_call_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000, help="conversions per timing run")
+    args = parser.parse_args()
+
+    converter = UnitConverter()
+    started = time.perf_counter()
+    ureg = converter.load()
+    print(f"registry build: {(time.perf_counter() - started) * 1000:.1f} ms (now deferred to the first /convert)")
+
+    print(f"{'pair':<40}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for unit_from, unit_to in PAIRS:
+        before = per_call_us(lambda: ureg.Quantity(12.5, ureg(unit_from).units).to(unit_to).magnitude, args.number)
+        converter.convert(12.5, unit_from, unit_to)
+        after = per_call_us(lambda: converter.convert(12.5, unit_from, unit_to), args.number)
+        print(f"{unit_from + ' -> ' + unit_to:<40}{before:>14.2f}{after:>14.2f}{before / after:>9.0f}x")
+
+    complete = per_call_us(lambda: converter.complete("me"), args.number)
+    print(f"autocomplete prefix lookup: {complete:.2f} us")
+
+if __name__ == "__main__":
+    main()
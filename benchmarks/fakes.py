@@ -0,0 +1,120 @@
+# benchmarks/fakes.py
+"""
+Just enough of discord.py's objects to drive cogs without a gateway.
+
+Each fake carries the attributes the cogs actually read; anything else
+raises AttributeError, which is the point: a cog reaching for something
+new should show up here rather than silently hitting Discord.
+"""
+import asyncio
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+
+snowflakes = itertools.count(1)
+# Same sequence in every process, so workers of one simulation agree on ids
+snowflake_times = random.Random(0)
+
+def next_snowflake():
+    # A millisecond timestamp above bit 22, as in real ids, so guilds spread across shards like real ones
+    return ((10**11 + snowflake_times.randrange(10**9)) << 22) | (next(snowflakes) & 0x3FFFFF)
+
+class FakeUser:
+    def __init__(self, name, user_id=None, bot=False):
+        self.id = user_id or next_snowflake()
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
+
+    def __eq__(self, other):
+        return isinstance(other, FakeUser) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+class FakeMember(FakeUser):
+    def __init__(self, name, guild, joined_at=None, user_id=None, bot=False):
+        super().__init__(name, user_id, bot)
+        self.guild = guild
+        self.joined_at = joined_at or datetime.now(timezone.utc) - timedelta(days=365)
+        self.roles = []
+
+class FakeChannel:
+    def __init__(self, guild, name="general"):
+        self.id = next_snowflake()
+        self.name = name
+        self.guild = guild
+
+class FakeGuild:
+    def __init__(self, name, member_count=0, seed=0):
+        self.id = next_snowflake()
+        self.name = name
+        rng = random.Random(seed)
+        self.members = [
+            FakeMember(f"member{index}", self, datetime.now(timezone.utc) - timedelta(days=rng.randint(1, 2000)))
+            for index in range(member_count)
+        ]
+        self.channels = [FakeChannel(self)]
+
+    def get_member(self, user_id):
+        return next((member for member in self.members if member.id == user_id), None)
+
+class FakeMessage:
+    def __init__(self, author, content, channel=None, created_at=None):
+        self.id = next_snowflake()
+        self.author = author
+        self.guild = author.guild
+        self.channel = channel or author.guild.channels[0]
+        self.content = content
+        self.created_at = created_at or datetime.now(timezone.utc)
+
+class FakeInteractionResponse:
+    def __init__(self):
+        self.responded = False
+
+    def is_done(self):
+        return self.responded
+
+class FakeContext:
+    """Stands in for discord.ApplicationContext; responses are collected in `responses`."""
+    def __init__(self, bot, author, channel=None):
+        self.bot = bot
+        self.author = author
+        self.user = author
+        self.guild = author.guild
+        self.channel = channel or author.guild.channels[0]
+        self.response = FakeInteractionResponse()
+        self.responses = []
+
+    async def respond(self, content=None, **kwargs):
+        self.response.responded = True
+        self.responses.append(content)
+
+    async def defer(self, **kwargs):
+        self.response.responded = True
+
+class FakeBot:
+    """The attributes of FlvrBot that cogs use, without a Discord connection."""
+    def __init__(self, db_manager, guilds=()):
+        self.db_manager = db_manager
+        self.guilds = list(guilds)
+        self.user = FakeUser("flvrbot", bot=True)
+        self.loop = asyncio.get_running_loop()
+        self.latency = 0.05
+        self.cogs = {}
+
+    def add_cog(self, cog):
+        self.cogs[cog.qualified_name] = cog
+
+    def get_cog(self, name):
+        return self.cogs.get(name)
+
+    async def shutdown(self):
+        for cog in self.cogs.values():
+            shutdown = getattr(cog, "shutdown", None)
+            if shutdown is not None:
+                await shutdown()
@@ -0,0 +1,767 @@
+# benchmarks/loadsim.py
+"""
+End-to-end load simulator: a real FlvrBot with every cog, driven through a
+fake gateway and a fake Discord REST API.
+
+The bot starts through FlvrBot.start as usual (migrations, cog startup,
+command sync), except that its HTTP session is replaced by FakeDiscordAPI
+and its gateway connection by SimulatedGateway. The gateway feeds raw
+dispatch payloads (READY, GUILD_CREATE, MESSAGE_CREATE, INTERACTION_CREATE)
+to py-cord's own parsers, so everything from payload parsing to the
+interaction callback runs the production code path. Run from the
+repository root:
+
+    python -m benchmarks.loadsim --guilds 10 --members 500 --rate 50,100,200,400 --duration 20
+    python -m benchmarks.loadsim --commands-per-sec 20 --mix top10=3,slap=2,convert=1 --record trace.jsonl
+    python -m benchmarks.loadsim --replay trace.jsonl --speed 4
+
+Each --rate is one stage of that many messages per second, run for
+--duration seconds. The report gives, per stage: messages and commands
+handled per second, event loop lag, database transactions per second and
+interaction latency percentiles, where interaction latency runs from the
+gateway dispatch to the interaction callback reaching the fake API. A stage
+is sustained when on_message kept up with the offered rate and the p95 loop
+lag stayed under --max-lag.
+
+A trace is one JSON object per line, {"t": seconds, "op": event, "d": payload},
+in the shape of gateway dispatches. --record writes every event the
+simulator sends, including READY and GUILD_CREATE, and --replay sends a
+trace again with its original timing scaled by --speed.
+
+--shards runs an AutoShardedFlvrBot, with a READY per shard and each guild
+on the shard Discord would route it to. Adding --workers splits the shards
+across processes through flvrbot.cluster, as in production: each worker
+gets its guilds' share of the offered load, and the report combines them.
+
+    python -m benchmarks.loadsim --guilds 40 --shards 8 --workers 2 --rate 100,200 --db-url postgresql://...
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import discord
+from discord.http import Route
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from multidict import CIMultiDict
+from sqlalchemy import event
+from benchmarks.fakes import FakeGuild, FakeMember, next_snowflake
+from benchmarks.run import seed_database, WORDS
+from flvrbot.bot import AutoShardedFlvrBot, FlvrBot
+from flvrbot.cluster import Cluster, shard_for_guild
+from flvrbot.db import get_db_manager
+from flvrbot.log import setup_logging
+
+# Permission bits granted to everyone in the simulated guilds: view channel, send messages, embed links, read history
+EVERYONE_PERMISSIONS = str(1024 | 2048 | 16384 | 65536)
+
+DEFAULT_MIX = (
+    "top10=2,rank=2,seen=1,slap=3,convert=2,currency=1,time=1,8ball=2,roulette=1,ping=1,"
+    "lenny=1,rekt=1,quote add=1,quote get=1,quote random=1"
+)
+
+def timestamp(value=None):
+    return (value or datetime.now(timezone.utc)).isoformat()
+
+def percentiles(samples):
+    """{p50, p95, p99, max} of `samples` in milliseconds, or None without samples."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1] * 1000}
+
+def format_percentiles(values):
+    if values is None:
+        return "n/a"
+    return " ".join(f"{name} {value:.1f}ms" for name, value in values.items())
+
+# Gateway payloads
+
+def user_payload(user_id, name, bot=False):
+    return {"id": str(user_id), "username": name, "global_name": name, "discriminator": "0", "avatar": None, "bot": bot}
+
+def member_payload(member):
+    return {
+        "user": user_payload(member.id, member.name, member.bot),
+        "nick": None, "roles": [], "joined_at": timestamp(member.joined_at),
+        "deaf": False, "mute": False, "flags": 0, "pending": False,
+    }
+
+def guild_payload(guild, bot_member):
+    return {
+        "id": str(guild.id), "name": guild.name, "owner_id": str(guild.members[0].id if guild.members else bot_member.id),
+        "unavailable": False, "member_count": len(guild.members) + 1, "large": len(guild.members) >= 250,
+        "joined_at": timestamp(bot_member.joined_at),
+        "roles": [{"id": str(guild.id), "name": "@everyone", "permissions": EVERYONE_PERMISSIONS, "position": 0,
+                   "color": 0, "hoist": False, "managed": False, "mentionable": False}],
+        "channels": [{"id": str(channel.id), "type": 0, "name": channel.name, "position": index, "permission_overwrites": []}
+                     for index, channel in enumerate(guild.channels)],
+        # Without the members intent Discord only sends the bot's own member
+        "members": [member_payload(bot_member)],
+        "emojis": [], "stickers": [], "features": [], "threads": [], "voice_states": [], "presences": [], "stage_instances": [],
+        "verification_level": 0, "default_message_notifications": 0, "explicit_content_filter": 0, "mfa_level": 0,
+        "premium_tier": 0, "nsfw_level": 0, "preferred_locale": "en-US",
+    }
+
+class Population:
+    """
+    The simulated guilds and the bot account they share.
+
+    With a shard_count, only the guilds Discord would route to `shard_ids`
+    are kept; every process generates the same ids from the same seed, so
+    workers of one run agree on which guild lives where.
+    """
+    def __init__(self, guild_count, members, seed, shard_count=None, shard_ids=None):
+        self.application_id = next_snowflake()
+        self.bot_user = user_payload(next_snowflake(), "flvrbot", bot=True)
+        self.shard_count = shard_count
+        self.shard_ids = list(range(shard_count)) if shard_count and shard_ids is None else shard_ids
+        guilds = [FakeGuild(f"guild{index}", members, seed=seed + index) for index in range(guild_count)]
+        self.guilds = [guild for guild in guilds if self.shard_of(guild.id) in (self.shard_ids or [None])]
+        # The part of the whole population's traffic this process receives
+        self.share = len(self.guilds) / len(guilds) if guilds else 1.0
+        self.rng = random.Random(seed)
+
+    def shard_of(self, guild_id):
+        return shard_for_guild(guild_id, self.shard_count) if self.shard_count else None
+
+    def ready_payload(self, shard_id=None):
+        guilds = [guild for guild in self.guilds if self.shard_of(guild.id) == shard_id]
+        payload = {
+            "v": 10, "user": self.bot_user, "session_id": "simulated", "resume_gateway_url": "wss://gateway.invalid",
+            "guilds": [{"id": str(guild.id), "unavailable": True} for guild in guilds],
+            "application": {"id": str(self.application_id), "flags": 0},
+        }
+        if shard_id is not None:
+            payload["shard"] = [shard_id, self.shard_count]
+            # What py-cord's sharded gateway adds to each shard's dispatches
+            payload["__shard_id__"] = shard_id
+        return payload
+
+    def setup_events(self):
+        """READY and then GUILD_CREATE for each guild, once per shard when sharded."""
+        for shard_id in self.shard_ids or [None]:
+            ready = self.ready_payload(shard_id)
+            yield "READY", ready
+            for entry in ready["guilds"]:
+                guild = next(guild for guild in self.guilds if str(guild.id) == entry["id"])
+                bot_member = FakeMember("flvrbot", guild, user_id=int(self.bot_user["id"]), bot=True)
+                yield "GUILD_CREATE", guild_payload(guild, bot_member)
+
+    def message_payload(self):
+        guild = self.rng.choice(self.guilds)
+        member = self.rng.choice(guild.members)
+        content = " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(1, 20)))
+        payload = member_payload(member)
+        return {
+            "id": str(next_snowflake()), "channel_id": str(guild.channels[0].id), "guild_id": str(guild.id),
+            "author": payload.pop("user"), "member": payload, "content": content, "timestamp": timestamp(),
+            "edited_timestamp": None, "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [],
+            "attachments": [], "embeds": [], "pinned": False, "type": 0, "flags": 0,
+        }
+
+    def interaction_payload(self, command, command_id):
+        guild = self.rng.choice(self.guilds)
+        member = self.rng.choice(guild.members)
+        options, resolved = build_options(command, self.rng, guild)
+        names = command.split(" ")
+        if len(names) == 2:
+            options = [{"name": names[1], "type": 1, "options": options}]
+        member_data = member_payload(member)
+        member_data["permissions"] = EVERYONE_PERMISSIONS
+        data = {"id": str(command_id), "name": names[0], "type": 1, "options": options}
+        if resolved:
+            data["resolved"] = resolved
+        return {
+            "id": str(next_snowflake()), "application_id": str(self.application_id), "type": 2, "token": f"sim{next_snowflake()}",
+            "version": 1, "guild_id": str(guild.id), "channel_id": str(guild.channels[0].id),
+            "channel": {"id": str(guild.channels[0].id), "type": 0, "name": guild.channels[0].name, "guild_id": str(guild.id),
+                        "position": 0, "permission_overwrites": []},
+            "member": member_data, "data": data, "locale": "en-US", "guild_locale": "en-US",
+            "app_permissions": EVERYONE_PERMISSIONS,
+        }
+
+def build_options(command, rng, guild):
+    """Options and resolved objects for one invocation of `command` with plausible arguments."""
+    resolved = {}
+    def member_option(name):
+        member = rng.choice(guild.members)
+        payload = member_payload(member)
+        resolved.setdefault("users", {})[str(member.id)] = payload.pop("user")
+        resolved.setdefault("members", {})[str(member.id)] = dict(payload, permissions=EVERYONE_PERMISSIONS)
+        return {"name": name, "type": 6, "value": str(member.id)}
+
+    if command == "top10":
+        options = [{"name": "module", "type": 3, "value": "user"}, {"name": "sort_by", "type": 3, "value": rng.choice(["messages", "characters"])}]
+    elif command == "rank":
+        options = [member_option("user")]
+    elif command in ("seen", "rekt", "joined"):
+        options = [member_option("user" if command == "seen" else "member")]
+    elif command == "slap":
+        options = [member_option("target")] if rng.random() < 0.7 else []
+    elif command == "convert":
+        unit_from, unit_to = rng.choice((("km", "mile"), ("f", "c"), ("pound", "kilogram"), ("km/h", "mph")))
+        options = [{"name": "value", "type": 10, "value": round(rng.uniform(1, 500), 2)},
+                   {"name": "unit_from", "type": 3, "value": unit_from}, {"name": "unit_to", "type": 3, "value": unit_to}]
+    elif command == "currency":
+        pair = rng.sample(["USD", "EUR", "GBP", "JPY", "CAD"], 2)
+        options = [{"name": "value", "type": 10, "value": round(rng.uniform(1, 500), 2)},
+                   {"name": "currency1", "type": 3, "value": pair[0]}, {"name": "currency2", "type": 3, "value": pair[1]}]
+    elif command == "time":
+        options = [{"name": "timezone", "type": 3, "value": rng.choice(["UTC", "US/Eastern", "Europe/London", "Asia/Tokyo"])}]
+    elif command == "8ball":
+        options = [{"name": "question", "type": 3, "value": "will it scale"}]
+    elif command == "quote add":
+        options = [{"name": "the_quote_to_add", "type": 3, "value": " ".join(rng.choice(WORDS) for _ in range(6))}]
+    elif command == "quote get":
+        options = [{"name": "identifier", "type": 3, "value": rng.choice(WORDS)}]
+    else:
+        options = []
+    return options, resolved
+
+# Fake REST API
+
+class FakeResponse:
+    def __init__(self, status, data=None):
+        self.status = status
+        self.reason = "OK" if status < 400 else "Error"
+        self.body = "" if data is None else json.dumps(data)
+        self.headers = CIMultiDict({"Content-Type": "application/json"} if data is not None else {})
+
+    async def text(self, encoding=None):
+        return self.body
+
+    async def read(self):
+        return self.body.encode()
+
+class FakeRequest:
+    """What FakeDiscordAPI.request returns: py-cord uses it as `async with session.request(...) as response`."""
+    def __init__(self, api, method, url, kwargs):
+        self.api = api
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+
+    async def __aenter__(self):
+        return await self.api.handle(self.method, self.url, self.kwargs)
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+class FakeDiscordAPI:
+    """
+    Stands in for the aiohttp session py-cord sends REST requests through.
+
+    Answers the routes the bot uses with plausible payloads after `latency`
+    seconds, keeps the registered application commands so command sync
+    works, and notes when each interaction gets its first callback.
+    """
+    def __init__(self, population, latency=0.0):
+        self.population = population
+        self.latency = latency
+        self.closed = False
+        self.commands = {}
+        self.command_ids = {}
+        self.requests = 0
+        self.unhandled = {}
+        # Interaction id -> perf_counter of its dispatch and of its first callback
+        self.dispatched = {}
+        self.answered = {}
+
+    def request(self, method, url, **kwargs):
+        return FakeRequest(self, method, url, kwargs)
+
+    async def close(self):
+        self.closed = True
+
+    def message_payload(self, channel_id=None):
+        return {
+            "id": str(next_snowflake()), "channel_id": str(channel_id or next_snowflake()), "author": self.population.bot_user,
+            "content": "", "timestamp": timestamp(), "edited_timestamp": None, "tts": False, "mention_everyone": False,
+            "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0, "flags": 0,
+        }
+
+    def register(self, scope, payloads):
+        commands = []
+        for payload in payloads:
+            key = (scope, payload["name"], payload.get("type", 1))
+            command_id = self.command_ids.setdefault(key, str(next_snowflake()))
+            commands.append(dict(payload, type=payload.get("type", 1), id=command_id, application_id=str(self.population.application_id), version="1"))
+        return commands
+
+    async def handle(self, method, url, kwargs):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        parts = urlsplit(url).path.split("/")[3:]  # drop "", "api", "v10"
+        if parts[:1] == ["interactions"] and parts[-1:] == ["callback"]:
+            self.answered.setdefault(int(parts[1]), time.perf_counter())
+            return FakeResponse(204)
+        if parts[:1] == ["applications"] and parts[-1:] == ["commands"]:
+            scope = parts[3] if len(parts) == 5 else None
+            if method == "PUT":
+                self.commands[scope] = self.register(scope, json.loads(kwargs.get("data") or "[]"))
+            elif method == "POST":
+                command = self.register(scope, [json.loads(kwargs["data"])])[0]
+                self.commands[scope] = [other for other in self.commands.get(scope, []) if other["name"] != command["name"]] + [command]
+                return FakeResponse(200, command)
+            return FakeResponse(200, self.commands.get(scope, []))
+        if parts[:1] == ["webhooks"] or (parts[:1] == ["channels"] and parts[-1:] == ["messages"]):
+            if method == "DELETE":
+                return FakeResponse(204)
+            return FakeResponse(200, self.message_payload(parts[1] if parts[0] == "channels" else None))
+        if parts == ["users", "@me"]:
+            return FakeResponse(200, self.population.bot_user)
+        route = f"{method} /{'/'.join(part if not part.isdigit() else '{id}' for part in parts)}"
+        self.unhandled[route] = self.unhandled.get(route, 0) + 1
+        return FakeResponse(200, {})
+
+# Gateway
+
+class SimulatedGateway:
+    """Replaces FlvrBot.connect: sends READY and GUILD_CREATE, then whatever `send` is given."""
+    def __init__(self, bot, population, api, record=None):
+        self.bot = bot
+        self.population = population
+        self.api = api
+        self.parsers = bot._connection.parsers
+        self.record = record
+        self.started = time.perf_counter()
+        self.closed = asyncio.Event()
+        self.sent = {}
+
+    def send(self, op, payload):
+        if self.record is not None:
+            self.record.write(json.dumps({"t": round(time.perf_counter() - self.started, 6), "op": op, "d": payload}) + "\n")
+        if op == "INTERACTION_CREATE":
+            self.api.dispatched[int(payload["id"])] = time.perf_counter()
+        self.sent[op] = self.sent.get(op, 0) + 1
+        self.parsers[op](payload)
+
+    async def connect(self, reconnect=True):
+        state = self.bot._connection
+        if self.population.shard_count:
+            # What AutoShardedClient.launch_shards sets up before the shards identify
+            state.shard_count = self.population.shard_count
+            state.shard_ids = self.population.shard_ids
+            state.shards_launched.set()
+        for op, payload in self.population.setup_events():
+            self.send(op, payload)
+        await self.closed.wait()
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes up from a short sleep."""
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.samples = []
+        self.task = None
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    def take(self):
+        samples, self.samples = self.samples, []
+        return samples
+
+    def stop(self):
+        self.task.cancel()
+
+class Counters:
+    """Database transactions and statements, counted from engine events."""
+    def __init__(self, engine):
+        self.transactions = 0
+        self.statements = 0
+        event.listen(engine.sync_engine, "commit", self.on_commit)
+        event.listen(engine.sync_engine, "after_cursor_execute", self.on_statement)
+
+    def on_commit(self, conn):
+        self.transactions += 1
+
+    def on_statement(self, *args):
+        self.statements += 1
+
+def parse_mix(spec, commands):
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.strip().partition("=")
+        if not name:
+            continue
+        if name not in commands:
+            raise SystemExit(f"Unknown command in --mix: {name!r}. Known: {', '.join(sorted(commands))}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def command_names(bot):
+    """Every invocable command path, e.g. "top10" and "quote add"."""
+    names = {}
+    for command in bot.pending_application_commands:
+        subcommands = getattr(command, "subcommands", None)
+        if subcommands:
+            for subcommand in subcommands:
+                names[f"{command.name} {subcommand.name}"] = command
+        elif isinstance(command, discord.SlashCommand):
+            names[command.name] = command
+    return names
+
+async def paced(rate, duration, action):
+    """Call `action` `rate` times a second for `duration` seconds, catching up on any calls a busy loop made late."""
+    if rate <= 0:
+        await asyncio.sleep(duration)
+        return
+    started = time.perf_counter()
+    for index in itertools.count():
+        due = started + index / rate
+        if due - started >= duration:
+            break
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        action()
+
+def handled_messages(bot):
+    return sum(histogram.count for labels, histogram in bot.metrics.listener_duration.items()
+               if labels["event"] == "on_message")
+
+def command_latencies(bot):
+    """{command: completion p95 in ms} from the bot's own histograms."""
+    return {labels["command"]: round(histogram.quantile(0.95) * 1000, 1)
+            for labels, histogram in bot.metrics.command_duration.items() if histogram.count}
+
+async def run_stage(bot, gateway, api, counters, lag, name, rate, commands_per_sec, duration, mix):
+    messages_before = handled_messages(bot)
+    transactions_before, statements_before = counters.transactions, counters.statements
+    sent_before = dict(gateway.sent)
+    dispatched_before = set(api.dispatched)
+    lag.take()
+    started = time.perf_counter()
+
+    command_choices, weights = list(mix), list(mix.values())
+    def send_command():
+        command = gateway.population.rng.choices(command_choices, weights)[0]
+        command_id = api.command_ids[(None, command.split(" ")[0], 1)]
+        gateway.send("INTERACTION_CREATE", gateway.population.interaction_payload(command, command_id))
+
+    await asyncio.gather(
+        paced(rate, duration, lambda: gateway.send("MESSAGE_CREATE", gateway.population.message_payload())),
+        paced(commands_per_sec if mix else 0, duration, send_command),
+    )
+    # Let in-flight handlers and interactions finish (bounded) so their work counts towards this stage
+    deadline = time.perf_counter() + 5
+    offered = gateway.sent.get("MESSAGE_CREATE", 0) - sent_before.get("MESSAGE_CREATE", 0)
+    def in_flight():
+        unanswered = any(interaction not in api.answered for interaction in api.dispatched if interaction not in dispatched_before)
+        return unanswered or handled_messages(bot) - messages_before < offered
+    while in_flight() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    drained = time.perf_counter()
+    return summarize_stage(bot, api, counters, lag, name, rate, started, duration, drained, offered, messages_before,
+                           transactions_before, statements_before, dispatched_before)
+
+def summarize_stage(bot, api, counters, lag, name, rate, started, duration, drained, offered, messages_before,
+                    transactions_before, statements_before, dispatched_before):
+    handled = handled_messages(bot) - messages_before
+    interactions = [interaction for interaction in api.dispatched if interaction not in dispatched_before]
+    latencies = [api.answered[interaction] - api.dispatched[interaction] for interaction in interactions if interaction in api.answered]
+    lag_samples = lag.take()
+    return {
+        "stage": name,
+        "offered_messages_per_sec": rate,
+        "messages_sent": offered,
+        "messages_handled": handled,
+        "messages_per_sec": handled / duration,
+        "drain_seconds": round(max(0.0, drained - started - duration), 3),
+        "commands_sent": len(interactions),
+        "commands_answered": len(latencies),
+        "commands_per_sec": len(latencies) / duration,
+        "commands_over_3s": sum(1 for latency in latencies if latency > 3.0),
+        "interaction_latency_ms": percentiles(latencies),
+        "loop_lag_ms": percentiles(lag_samples),
+        "loop_lag_mean_ms": statistics.fmean(lag_samples) * 1000 if lag_samples else None,
+        "db_transactions_per_sec": (counters.transactions - transactions_before) / duration,
+        "db_statements_per_sec": (counters.statements - statements_before) / duration,
+        # Raw samples in seconds, so results from several workers can be combined
+        "samples": {"interaction_latency": latencies, "loop_lag": lag_samples},
+    }
+
+def judge_stage(result, max_lag):
+    lag_p95 = (result["loop_lag_ms"] or {}).get("p95", 0)
+    kept_up = result["messages_handled"] >= 0.98 * result["messages_sent"] and result["drain_seconds"] < 1.0
+    result["sustained"] = kept_up and lag_p95 <= max_lag
+
+def merge_stages(stages):
+    """One stage result from the same stage on several workers; loop lag is the worst worker's."""
+    merged = dict(stages[0])
+    for key in ("offered_messages_per_sec", "messages_sent", "messages_handled", "messages_per_sec", "commands_sent",
+                "commands_answered", "commands_per_sec", "commands_over_3s", "db_transactions_per_sec", "db_statements_per_sec"):
+        merged[key] = sum(stage[key] or 0 for stage in stages)
+    merged["drain_seconds"] = max(stage["drain_seconds"] for stage in stages)
+    latencies = [latency for stage in stages for latency in stage["samples"]["interaction_latency"]]
+    merged["interaction_latency_ms"] = percentiles(latencies)
+    worst = max(stages, key=lambda stage: (stage["loop_lag_ms"] or {}).get("p95", 0))
+    merged["loop_lag_ms"], merged["loop_lag_mean_ms"] = worst["loop_lag_ms"], worst["loop_lag_mean_ms"]
+    merged["samples"] = {"interaction_latency": latencies,
+                         "loop_lag": [lag for stage in stages for lag in stage["samples"]["loop_lag"]]}
+    merged["workers"] = len(stages)
+    return merged
+
+def print_stage(result):
+    print(f"\n== {result['stage']}: {result['offered_messages_per_sec']} messages/s offered "
+          f"({'sustained' if result['sustained'] else 'FELL BEHIND'})")
+    print(f"messages:     {result['messages_handled']}/{result['messages_sent']} handled, {result['messages_per_sec']:.1f}/s, "
+          f"drained {result['drain_seconds']:.2f}s after the stage")
+    print(f"commands:     {result['commands_answered']}/{result['commands_sent']} answered, {result['commands_per_sec']:.1f}/s, "
+          f"{result['commands_over_3s']} over 3s")
+    print(f"interactions: {format_percentiles(result['interaction_latency_ms'])}")
+    print(f"loop lag:     {format_percentiles(result['loop_lag_ms'])}")
+    print(f"database:     {result['db_transactions_per_sec']:.1f} transactions/s, {result['db_statements_per_sec']:.1f} statements/s")
+
+async def replay(gateway, api, path, speed):
+    """Send the non-setup events of a trace with their recorded spacing divided by `speed`."""
+    started = time.perf_counter()
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry["op"] in ("READY", "GUILD_CREATE"):
+                continue
+            delay = started + entry["t"] / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            payload = entry["d"]
+            if entry["op"] == "INTERACTION_CREATE":
+                # Command ids come from this run's sync, not the recorded one
+                payload["data"]["id"] = api.command_ids[(None, payload["data"]["name"], payload["data"].get("type", 1))]
+            gateway.send(entry["op"], payload)
+
+class TracePopulation(Population):
+    """A population whose READY and GUILD_CREATE payloads come from a recorded trace."""
+    def __init__(self, path, seed):
+        self.rng = random.Random(seed)
+        self.guilds = []
+        self.share = 1.0
+        self.events = []
+        self.shard_ids = None
+        self.shard_count = None
+        with open(path) as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["op"] in ("READY", "GUILD_CREATE"):
+                    self.events.append((entry["op"], entry["d"]))
+                if entry["op"] == "READY" and "shard" in entry["d"]:
+                    # A trace recorded with --shards replays on the same shards
+                    shard_id, self.shard_count = entry["d"]["shard"]
+                    self.shard_ids = (self.shard_ids or []) + [shard_id]
+        ready = next(payload for op, payload in self.events if op == "READY")
+        self.bot_user = ready["user"]
+        self.application_id = int(ready["application"]["id"])
+
+    def setup_events(self):
+        return iter(self.events)
+
+async def simulate(args, shard_ids=None, worker=None):
+    """
+    Run the simulation in this process and return the stage results.
+
+    `worker` is set when this process is one of several started by
+    run_cluster: it then only simulates the guilds of `shard_ids`, at their
+    share of the offered rates, and leaves seeding and the report to the
+    parent.
+    """
+    if args.replay:
+        population = TracePopulation(args.replay, args.seed)
+    else:
+        population = Population(args.guilds, args.members, args.seed, args.shards, shard_ids)
+    api = FakeDiscordAPI(population, args.api_latency)
+    record_path = args.record if worker is None or not args.record else f"{args.record}.worker{worker}"
+    record = open(record_path, "w") if record_path else None
+
+    if population.shard_count:
+        bot = AutoShardedFlvrBot(token="simulated", shard_ids=population.shard_ids, shard_count=population.shard_count)
+    else:
+        bot = FlvrBot(token="simulated")
+    bot.http.static_login = lambda token: fake_login(bot.http, api, token)
+    bot._connection.guild_ready_timeout = 0.1
+    gateway = SimulatedGateway(bot, population, api, record)
+    bot.connect = gateway.connect
+    counters = Counters(bot.db_manager.engine)
+    lag = LoopLagMonitor()
+
+    if worker is None and population.guilds and args.quotes:
+        await seed_database(bot.db_manager, population.guilds, args.quotes, random.Random(args.seed))
+
+    started = time.perf_counter()
+    runner = asyncio.create_task(bot.start("simulated"))
+    await bot.wait_until_ready()
+    # on_connect's command sync runs alongside READY; wait for it to register the commands
+    while not api.command_ids:
+        await asyncio.sleep(0.01)
+    shards = f", shards {population.shard_ids} of {population.shard_count}" if population.shard_count else ""
+    print(f"{'' if worker is None else f'Worker {worker}: '}Bot ready in {(time.perf_counter() - started) * 1000:.0f}ms "
+          f"with {len(bot.cogs)} cogs, {len(bot.guilds)} guilds, {len(api.command_ids)} commands{shards}", file=sys.stderr)
+
+    results = []
+    lag.start()
+    try:
+        if args.replay:
+            replay_started = time.perf_counter()
+            before = (handled_messages(bot), counters.transactions, counters.statements, set(api.dispatched))
+            await replay(gateway, api, args.replay, args.speed)
+            duration = time.perf_counter() - replay_started
+            await asyncio.sleep(0.5)
+            result = summarize_stage(bot, api, counters, lag, "replay", None, replay_started, duration, time.perf_counter(),
+                                     gateway.sent.get("MESSAGE_CREATE", 0), *before)
+            result["offered_messages_per_sec"] = round(result["messages_sent"] / duration, 1) if duration else None
+            judge_stage(result, args.max_lag)
+            results.append(result)
+            print_stage(result)
+        else:
+            mix = parse_mix(args.mix, command_names(bot))
+            for rate in args.rate:
+                # Each worker gets its guilds' share of the traffic; the stage keeps the name of the total rate
+                result = await run_stage(bot, gateway, api, counters, lag, f"{rate}/s", rate * population.share,
+                                         args.commands_per_sec * population.share, args.duration, mix)
+                judge_stage(result, args.max_lag)
+                results.append(result)
+                if worker is None:
+                    print_stage(result)
+                if not result["sustained"] and not args.keep_going:
+                    break
+    finally:
+        lag.stop()
+        gateway.closed.set()
+        await bot.close()
+        await runner
+        if record is not None:
+            record.close()
+
+    if worker is None:
+        print_summary(results)
+        print(f"Command p95 completion (bot metrics): {command_latencies(bot)}")
+    if api.unhandled:
+        print(f"Unhandled API routes (answered with {{}}): {api.unhandled}", file=sys.stderr)
+    return results
+
+def print_summary(results):
+    sustained = [result["offered_messages_per_sec"] for result in results if result.get("sustained")]
+    print(f"\nHighest sustained message rate: {max(sustained) if sustained else 'none'} messages/s")
+
+def simulate_worker(index, shard_ids, shard_count, args, results_dir):
+    """Cluster target: one worker's part of the simulation, its results written to `results_dir`."""
+    setup_logging(logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr)
+    results = asyncio.run(simulate(args, shard_ids, worker=index))
+    with open(os.path.join(results_dir, f"worker{index}.json"), "w") as f:
+        json.dump(results, f)
+
+async def seed_shared_database(population, args):
+    db = get_db_manager()
+    try:
+        await seed_database(db, population.guilds, args.quotes, random.Random(args.seed))
+    finally:
+        await db.close()
+
+def run_cluster(args, results_dir):
+    """
+    Run the simulation on --shards shards across --workers processes with flvrbot.cluster, as in production.
+
+    The database is seeded once here; each worker then runs its block of
+    shards and the per-stage results of all workers are combined.
+    """
+    population = Population(args.guilds, args.members, args.seed)
+    if population.guilds and args.quotes:
+        asyncio.run(seed_shared_database(population, args))
+    # A simulation that crashes would only crash again
+    cluster = Cluster(simulate_worker, args.shards, args.workers, kwargs={"args": args, "results_dir": results_dir},
+                      max_restarts=0)
+    exit_codes = cluster.run(poll_interval=0.1)
+    failed = {index: code for index, code in exit_codes.items() if code != 0}
+    if failed:
+        print(f"Workers failed (worker: exit status): {failed}", file=sys.stderr)
+
+    worker_results = []
+    for index in sorted(exit_codes):
+        path = os.path.join(results_dir, f"worker{index}.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                worker_results.append(json.load(f))
+    results = []
+    # A worker stops after its first stage that falls behind, so later stages may not have run everywhere
+    for stages in zip(*worker_results):
+        result = merge_stages(stages)
+        result["offered_messages_per_sec"] = round(result["offered_messages_per_sec"], 3)
+        judge_stage(result, args.max_lag)
+        result["sustained"] = result["sustained"] and all(stage["sustained"] for stage in stages)
+        results.append(result)
+        print_stage(result)
+    print_summary(results)
+    return results
+
+async def fake_login(http, api, token):
+    """HTTPClient.static_login, with the fake API in place of a new aiohttp session."""
+    http._HTTPClient__session = api
+    http.token = token
+    return await http.request(Route("GET", "/users/@me"))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", help="database for the bot (default: temporary SQLite file)")
+    parser.add_argument("--guilds", type=int, default=5)
+    parser.add_argument("--members", type=int, default=200, help="members per guild")
+    parser.add_argument("--quotes", type=int, default=100, help="quotes to seed per guild")
+    parser.add_argument("--rate", type=lambda value: [float(rate) for rate in value.split(",")], default=[50.0],
+                        help="messages per second, or a comma-separated list of stages (default 50)")
+    parser.add_argument("--commands-per-sec", type=float, default=5.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="command=weight list (default: %(default)s)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per stage")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="seconds the fake Discord API takes to answer")
+    parser.add_argument("--max-lag", type=float, default=50.0, help="p95 event loop lag in ms a sustained stage stays under")
+    parser.add_argument("--keep-going", action="store_true", help="run every stage even after one falls behind")
+    parser.add_argument("--record", help="write the events sent to this trace file")
+    parser.add_argument("--replay", help="replay this trace instead of generating load")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier")
+    parser.add_argument("--shards", type=int, help="run an AutoShardedFlvrBot with this many shards")
+    parser.add_argument("--workers", type=int, default=1, help="split the shards across this many processes (default 1)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's own logging")
+    args = parser.parse_args()
+    if args.workers > 1 and not args.shards:
+        parser.error("--workers needs --shards")
+    if args.workers > 1 and args.replay:
+        parser.error("--replay runs in one process; replay each worker's trace separately")
+
+    # The production logging pipeline, so its cost is part of the measurement
+    setup_logging(logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr)
+    # Keep the currency cog off the network, and let the weather cog load; /weather itself is not in the default mix
+    os.environ.setdefault("CURRENCY_RATES_FILE", os.path.join(os.path.dirname(__file__), "..", "example", "rates.json"))
+    os.environ.setdefault("OPENWEATHER_APIKEY", "simulated")
+    os.environ.setdefault("GOOGLE_MAPS_APIKEY", "simulated")
+    os.environ.setdefault("COG_RELOAD_INTERVAL", "0")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        os.environ["DB_URL"] = args.db_url or f"sqlite:///{os.path.join(scratch, 'loadsim.db')}"
+        if args.workers > 1:
+            results = run_cluster(args, scratch)
+        else:
+            results = asyncio.run(simulate(args))
+
+    for result in results:
+        del result["samples"]
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"created": timestamp(), "config": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,9 @@
 # main.py
-import logging
 import os
-import sys
 from dotenv import load_dotenv
 from flvrbot.bot import FlvrBot
-
-def setup_logging():
-    log_level_str = os.environ.get('LOG_LEVEL', "DEBUG").upper()
-    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    logging.basicConfig(stream=sys.stdout, level=log_level_str, format=log_format)
+from flvrbot.cluster import cluster_from_env
+from flvrbot.log import setup_logging_from_env
 
 def load_env():
     dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
@@ -17,11 +12,14 @@ def load_env():
 
 def main():
     load_env()
-    setup_logging()
+    setup_logging_from_env()
     token = os.environ.get('DISCORD_TOKEN')
     if not token:
         print("Error: Discord token not found in environment variable 'DISCORD_TOKEN'")
         return
+    if os.environ.get('SHARD_COUNT') or os.environ.get('CLUSTER_WORKERS'):
+        cluster_from_env(token).run()
+        return
     bot = FlvrBot(token=token)
     bot.run()
 
@@ -1,14 +1,56 @@
 # flvrbot/bot.py
 
+import asyncio
 import discord
 from discord.ext import commands
+import functools
 import logging
+import os
+import time
 from flvrbot import load_cogs
-from flvrbot.db import DBManager
+from flvrbot.db import get_db_manager
+from flvrbot.metrics import BotMetrics, MetricsServer
+from flvrbot.reload import ReloadManager
 import pytz
 
-class FlvrBot(commands.Bot):
-    def __init__(self, token=None, command_prefix='!', description=None):
+class FlvrContext(discord.ApplicationContext):
+    """ApplicationContext that notes when the interaction was first responded to (or deferred)."""
+    def __init__(self, bot, interaction):
+        super().__init__(bot, interaction)
+        self.received_at = time.perf_counter()
+        self.first_response_at = None
+
+    def timed(self, send):
+        @functools.wraps(send)
+        async def timed_send(*args, **kwargs):
+            result = await send(*args, **kwargs)
+            if self.first_response_at is None:
+                self.first_response_at = time.perf_counter()
+            return result
+        return timed_send
+
+    @property
+    def respond(self):
+        return self.timed(super().respond)
+
+    @property
+    def defer(self):
+        return self.timed(super().defer)
+
+    @property
+    def send_response(self):
+        return self.timed(super().send_response)
+
+class FlvrBotMixin:
+    """
+    Everything FlvrBot adds to py-cord's bot: cogs, database, metrics and startup.
+
+    Combined with commands.Bot as FlvrBot (one gateway connection for every
+    guild) and with commands.AutoShardedBot as AutoShardedFlvrBot. Extra
+    keyword arguments, such as shard_ids and shard_count, go to the py-cord
+    base class.
+    """
+    def __init__(self, token=None, command_prefix='!', description=None, **options):
         if token is None:
             raise ValueError("Token is required")
 
@@ -23,18 +65,140 @@ class FlvrBot(commands.Bot):
         #intents.message_content = True
         #intents.direct_messages = True
 
-        super().__init__(command_prefix=command_prefix, description=description, intents=intents)
+        # Before super().__init__, which may already register listeners
+        self.metrics = BotMetrics()
+        self.metrics_server = None
+        self.cog_startup = None
+        self.listener_wrappers = {}
+
+        super().__init__(command_prefix=command_prefix, description=description, intents=intents, **options)
 
         # Setup DBManager
-        self.db_manager = DBManager()
+        self.db_manager = get_db_manager()
 
         # Load cogs
-        load_cogs.setup(self)
+        self.cog_loader = load_cogs.CogLoader(self)
+        self.cog_loader.load_cogs()
+        self.before_invoke(self.cog_loader.before_invoke)
+        self.reload_manager = ReloadManager(self, self.cog_loader)
 
         @self.event
         async def on_ready():
-            self.logger.info(f'Logged in as {self.user}')
+            self.logger.info('Logged in as %s', self.user)
+
+        @self.event
+        async def on_shard_ready(shard_id):
+            guilds = sum(1 for guild in self.guilds if guild.shard_id == shard_id)
+            self.logger.info('Shard %s is ready with %d guilds', shard_id, guilds)
+
+    def _load_from_module_spec(self, spec, key):
+        # py-cord imports an extension and calls its setup() in one step; this lets the loader time them separately
+        cog_loader = getattr(self, "cog_loader", None)
+        if cog_loader is not None:
+            cog_loader.time_import(spec, key)
+        super()._load_from_module_spec(spec, key)
+
+    def add_listener(self, func, name=discord.utils.MISSING):
+        super().add_listener(self.timed_listener(func, func.__name__ if name is discord.utils.MISSING else name), name)
+
+    def remove_listener(self, func, name=discord.utils.MISSING):
+        wrapper = self.listener_wrappers.pop(func, func)
+        super().remove_listener(wrapper, name)
+
+    def timed_listener(self, func, name):
+        listener = getattr(func, "__qualname__", repr(func))
+        duration = self.metrics.listener_duration.labels(event=name, listener=listener)
+        errors = self.metrics.listener_errors.labels(event=name, listener=listener)
+
+        @functools.wraps(func)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with self.db_manager.query_stats.scope(listener):
+                    return await func(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                duration.observe(time.perf_counter() - started)
+        self.listener_wrappers[func] = timed
+        return timed
+
+    async def get_application_context(self, interaction, cls=None):
+        return await super().get_application_context(interaction, cls=cls or FlvrContext)
+
+    async def invoke_application_command(self, ctx):
+        try:
+            with self.db_manager.query_stats.scope(f"/{ctx.command.qualified_name}"):
+                await super().invoke_application_command(ctx)
+        finally:
+            self.record_command(ctx)
+
+    def record_command(self, ctx):
+        finished = time.perf_counter()
+        received = getattr(ctx, "received_at", finished)
+        labels = {"command": ctx.command.qualified_name, "cog": ctx.cog.qualified_name if ctx.cog else ""}
+        self.metrics.command_duration.labels(**labels).observe(finished - received)
+        first_response = getattr(ctx, "first_response_at", None)
+        if first_response is not None:
+            self.metrics.command_first_response.labels(**labels).observe(first_response - received)
+        elif not ctx.response.is_done():
+            self.metrics.command_unanswered.labels(**labels).inc()
+        if getattr(ctx, "command_failed", False):
+            self.metrics.command_errors.labels(**labels).inc()
+
+    async def start(self, token, *, reconnect=True):
+        started = time.perf_counter()
+        metrics_port = os.environ.get('METRICS_PORT')
+        if metrics_port:
+            self.metrics_server = MetricsServer([self.metrics, self.db_manager.query_stats], os.environ.get('METRICS_HOST', '127.0.0.1'), int(metrics_port))
+            await self.metrics_server.start()
+        # The schema migrations and the Discord login don't depend on each other
+        await asyncio.gather(self.db_manager.migrate(), self.login(token))
+        # Cog startup hooks may wait on remote services; the gateway connects meanwhile, and
+        # CogLoader.before_invoke holds each cog's commands until its own startup is done
+        self.cog_startup = asyncio.create_task(self.initialize_cogs(started, time.perf_counter()))
+        await self.connect(reconnect=reconnect)
+
+    async def initialize_cogs(self, started, ready):
+        await self.cog_loader.initialize()
+        finished = time.perf_counter()
+        self.logger.info(
+            "Startup took %.1fms (login and migrations %.1fms, cog startup %.1fms)",
+            (finished - started) * 1000, (ready - started) * 1000, (finished - ready) * 1000
+        )
+        for line in self.cog_loader.report():
+            self.logger.info("Cog profile: %s", line)
+
+    async def close(self):
+        if self.cog_startup is not None and not self.cog_startup.done():
+            self.cog_startup.cancel()
+        try:
+            # Give cogs holding buffered writes a chance to persist them
+            for cog in list(self.cogs.values()):
+                shutdown = getattr(cog, "shutdown", None)
+                if shutdown is not None:
+                    try:
+                        await shutdown()
+                    except Exception:
+                        self.logger.exception("Shutdown of cog %s failed", cog.qualified_name)
+        finally:
+            await super().close()
+            await self.db_manager.close()
+            if self.metrics_server is not None:
+                await self.metrics_server.stop()
 
     def run(self):
         super().run(self.token)
 
+class FlvrBot(FlvrBotMixin, commands.Bot):
+    """FlvrBot on a single gateway connection."""
+
+class AutoShardedFlvrBot(FlvrBotMixin, commands.AutoShardedBot):
+    """
+    FlvrBot running `shard_ids` out of `shard_count` shards in this process.
+
+    Without shard_ids every shard runs here, and without shard_count py-cord
+    asks Discord for the recommended number. flvrbot.cluster splits the
+    shards across processes.
+    """
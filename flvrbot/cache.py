@@ -0,0 +1,95 @@
+# flvrbot/cache.py
+import asyncio
+import time
+from collections import OrderedDict
+
+# Returned by TTLCache.get on a miss, since None is a perfectly good cached value.
+MISSING = object()
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries also expire `ttl` seconds after they are set.
+
+    A `maxsize` of 0 disables caching. `generation` increases on every
+    invalidation so a caller can tell whether a value it loaded may already be
+    stale before storing it.
+    """
+    def __init__(self, maxsize, ttl, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        value, expires = entry
+        if expires <= self.clock():
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return MISSING
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, generation=None):
+        """Store `value`, unless the cache was invalidated since `generation` was read."""
+        if self.maxsize <= 0 or (generation is not None and generation != self.generation):
+            return
+        self.entries[key] = (value, self.clock() + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, *keys):
+        self.generation += 1
+        for key in keys:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        self.generation += 1
+        self.entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one in-flight task.
+
+    Every caller awaiting `do` with a key that is already running gets that
+    call's result (or exception) instead of starting another one.
+    """
+    def __init__(self):
+        self.calls = {}
+
+    def __len__(self):
+        return len(self.calls)
+
+    async def do(self, key, func):
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self.calls.pop(key, None) if self.calls.get(key) is done else None)
+        # shield() so one caller being cancelled doesn't cancel the call for everyone else
+        return await asyncio.shield(task)
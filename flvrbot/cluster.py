@@ -0,0 +1,204 @@
+# flvrbot/cluster.py
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+DISCORD_API = "https://discord.com/api/v10"
+
+def shard_for_guild(guild_id, shard_count):
+    """The shard Discord routes a guild's events to."""
+    return (guild_id >> 22) % shard_count
+
+def assign_shards(shard_count, workers):
+    """
+    Split shards 0..shard_count-1 into `workers` contiguous, near-equal blocks.
+
+    Each worker identifies its own shards one after another, as py-cord
+    does for any AutoShardedBot; identifies are not coordinated across
+    workers, so Discord's per-bucket identify limit can turn some away when
+    workers start together, and py-cord retries them.
+    """
+    if shard_count < 1 or workers < 1:
+        raise ValueError("shard_count and workers must be at least 1")
+    workers = min(workers, shard_count)
+    return [list(range(index * shard_count // workers, (index + 1) * shard_count // workers)) for index in range(workers)]
+
+async def fetch_shard_count(token, api_base=DISCORD_API):
+    """Discord's recommended shard count for the bot, from GET /gateway/bot."""
+    headers = {"Authorization": f"Bot {token}"}
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+        async with session.get(f"{api_base}/gateway/bot", headers=headers) as response:
+            response.raise_for_status()
+            data = await response.json()
+    return data["shards"]
+
+def run_worker(index, shard_ids, shard_count, token):
+    """Worker process entry point: one AutoShardedFlvrBot for `shard_ids`."""
+    # Imported here so the parent process never loads the cogs
+    from flvrbot.bot import AutoShardedFlvrBot
+    from flvrbot.log import setup_logging_from_env
+
+    setup_logging_from_env()
+    metrics_port = os.environ.get('METRICS_PORT')
+    if metrics_port:
+        # One endpoint per worker: METRICS_PORT, METRICS_PORT + 1, ...
+        os.environ['METRICS_PORT'] = str(int(metrics_port) + index)
+    logger.info("Worker %s starting shards %s of %s", index, shard_ids, shard_count)
+    # Every worker syncs commands: that is also how py-cord learns their ids, and an unchanged set is only read, not rewritten
+    bot = AutoShardedFlvrBot(token=token, shard_ids=shard_ids, shard_count=shard_count)
+    asyncio.run(serve(bot))
+
+async def serve(bot):
+    """
+    Run `bot` until it stops by itself or the process gets SIGTERM, then close it.
+
+    Used instead of Client.run, which would install its own SIGINT handler
+    over the one worker_main sets.
+    """
+    terminated = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, terminated.set)
+    runner = asyncio.create_task(bot.start(bot.token))
+    waiter = asyncio.create_task(terminated.wait())
+    await asyncio.wait((runner, waiter), return_when=asyncio.FIRST_COMPLETED)
+    waiter.cancel()
+    if not runner.done():
+        logger.info("Worker received SIGTERM, closing")
+        await bot.close()
+    # Raises what the bot failed with, so the worker exits non-zero and is restarted
+    await runner
+
+def worker_main(target, index, shard_ids, shard_count, kwargs):
+    # A Ctrl-C in the terminal reaches every process in the group; only the parent acts on it, and stops
+    # the workers with SIGTERM, which run_worker handles by closing the bot
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    target(index, shard_ids, shard_count, **kwargs)
+
+class Cluster:
+    """
+    Runs `shard_count` shards across worker processes, one block of shard ids each.
+
+    `target(index, shard_ids, shard_count, **kwargs)` runs in each worker;
+    it is run_worker in production and a simulated gateway in the load
+    simulator. A worker that dies is started again after `restart_delay`
+    seconds, doubling up to `max_restart_delay` while it keeps failing
+    within `stable_after` seconds of starting. A worker that exits with
+    status 0 is not restarted, and with `max_restarts` set neither is one that
+    has already been restarted that many times. SIGTERM or SIGINT stops every worker, giving
+    them `stop_timeout` seconds to shut down cleanly.
+    """
+    def __init__(self, target, shard_count, workers, kwargs=None, restart_delay=5.0, max_restart_delay=300.0,
+                 stable_after=60.0, stop_timeout=30.0, max_restarts=None):
+        self.target = target
+        self.shard_count = shard_count
+        self.assignments = assign_shards(shard_count, workers)
+        self.kwargs = kwargs or {}
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stable_after = stable_after
+        self.stop_timeout = stop_timeout
+        self.max_restarts = max_restarts
+        # Spawned rather than forked: workers must not inherit the parent's event loop or connections
+        self.context = multiprocessing.get_context("spawn")
+        self.processes = {}
+        self.started_at = {}
+        self.delays = {}
+        self.restart_at = {}
+        self.restarts = {}
+        self.given_up = set()
+        self.stopping = False
+
+    def start_worker(self, index):
+        process = self.context.Process(
+            target=worker_main,
+            args=(self.target, index, self.assignments[index], self.shard_count, self.kwargs),
+            name=f"flvrbot-worker-{index}",
+        )
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.monotonic()
+        logger.info("Started worker %s (pid %s) for shards %s", index, process.pid, self.assignments[index])
+
+    def check_workers(self):
+        """Schedule restarts for workers that died. Returns False once every worker has exited cleanly."""
+        now = time.monotonic()
+        running = False
+        for index, process in list(self.processes.items()):
+            if process.is_alive():
+                running = True
+                continue
+            if index in self.given_up:
+                continue
+            if index in self.restart_at:
+                running = True
+                if now >= self.restart_at[index]:
+                    del self.restart_at[index]
+                    self.start_worker(index)
+                continue
+            if process.exitcode == 0:
+                logger.info("Worker %s exited", index)
+                continue
+            uptime = now - self.started_at[index]
+            if self.max_restarts is not None and self.restarts.get(index, 0) >= self.max_restarts:
+                self.given_up.add(index)
+                logger.error("Worker %s exited with status %s after %.0fs, not restarting it", index, process.exitcode, uptime)
+                continue
+            self.restarts[index] = self.restarts.get(index, 0) + 1
+            if uptime >= self.stable_after or index not in self.delays:
+                delay = self.restart_delay
+            else:
+                delay = min(self.max_restart_delay, self.delays[index] * 2)
+            self.delays[index] = delay
+            self.restart_at[index] = now + delay
+            running = True
+            logger.error("Worker %s exited with status %s after %.0fs, restarting in %.0fs", index, process.exitcode, uptime, delay)
+        return running
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def shutdown(self):
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + self.stop_timeout
+        for index, process in self.processes.items():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning("Worker %s did not stop in time, killing it", index)
+                process.kill()
+                process.join()
+
+    def run(self, poll_interval=1.0):
+        """Start every worker and supervise them until stopped or until all have exited cleanly."""
+        previous = {sig: signal.signal(sig, self.stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            for index in range(len(self.assignments)):
+                self.start_worker(index)
+            while not self.stopping and self.check_workers():
+                time.sleep(poll_interval)
+        finally:
+            self.shutdown()
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+        return {index: process.exitcode for index, process in self.processes.items()}
+
+def cluster_from_env(token):
+    """
+    A Cluster for the bot configured by SHARD_COUNT and CLUSTER_WORKERS.
+
+    SHARD_COUNT defaults to Discord's recommendation for the bot, and
+    CLUSTER_WORKERS to one per CPU, never more than there are shards.
+    """
+    shard_count = os.environ.get('SHARD_COUNT', 'auto')
+    if shard_count == 'auto':
+        shard_count = asyncio.run(fetch_shard_count(token))
+        logger.info("Discord recommends %s shards", shard_count)
+    shard_count = int(shard_count)
+    workers = int(os.environ.get('CLUSTER_WORKERS') or os.cpu_count() or 1)
+    return Cluster(run_worker, shard_count, workers, kwargs={"token": token})
@@ -0,0 +1,116 @@
+import discord
+from discord.ext import commands, tasks
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Discord's deadline for the first response to an interaction, in seconds
+INTERACTION_DEADLINE = 3.0
+
+def format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f}ms"
+
+async def extension_autocomplete(ctx: discord.AutocompleteContext):
+    return [name for name in sorted(ctx.bot.extensions) if ctx.value.lower() in name.lower()][:25]
+
+class AdminCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        # Seconds between checks of /app/cogs for changed files; 0 turns automatic reloading off
+        reload_interval = float(os.environ.get('COG_RELOAD_INTERVAL', 5))
+        if reload_interval > 0:
+            self.watch_cogs.change_interval(seconds=reload_interval)
+            self.watch_cogs.start()
+
+    def cog_unload(self):
+        self.watch_cogs.cancel()
+
+    @tasks.loop(seconds=5)
+    async def watch_cogs(self):
+        await self.bot.reload_manager.poll()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        logger.info("Admin module has been loaded")
+
+    @commands.slash_command(name="dbpool", description="Displays database connection pool and cache statistics. Admin role required.")
+    @commands.has_permissions(administrator=True)
+    async def dbpool(self, ctx: discord.ApplicationContext):
+        status = self.bot.db_manager.pool_status()
+        lines = [f"**Pool:** {status['pool_class']}"]
+        if "size" in status:
+            lines.append(
+                f"**Checked out:** {status['checked_out']} **Idle:** {status['checked_in']} "
+                f"**Size:** {status['size']} **Overflow:** {status['overflow']}/{status['max_overflow']}"
+            )
+        lines.append(
+            f"**Acquisitions:** {status['acquisitions']} "
+            f"**Wait:** avg {status['wait_avg_ms']:.2f}ms / max {status['wait_max_ms']:.2f}ms"
+        )
+        cache = self.bot.db_manager.cache.stats()
+        lines.append(
+            f"**Cache:** {cache['size']}/{cache['maxsize']} entries, {cache['hits']} hits, {cache['misses']} misses, "
+            f"{cache['evictions']} evictions, {cache['expirations']} expirations"
+        )
+        methods = self.bot.db_manager.query_stats.summary()
+        if methods:
+            lines.append("**Methods** (slowest p95 first)")
+        for method, calls, p50, p95, p99, rows in methods[:10]:
+            lines.append(f"{method}: {calls} calls, p50 {format_ms(p50)} p95 {format_ms(p95)} p99 {format_ms(p99)}, {rows} rows")
+        await ctx.respond("\n".join(lines)[:2000], ephemeral=True)
+
+    @commands.slash_command(name="perf", description="Summarizes command and listener latency. Admin role required.")
+    @commands.has_permissions(administrator=True)
+    async def perf(self, ctx: discord.ApplicationContext):
+        metrics = self.bot.metrics
+        first_responses = {(labels["command"], labels["cog"]): histogram for labels, histogram in metrics.command_first_response.items()}
+        errors = {(labels["command"], labels["cog"]): counter.value for labels, counter in metrics.command_errors.items()}
+        commands_by_p95 = sorted(metrics.command_duration.items(), key=lambda item: item[1].quantile(0.95) or 0, reverse=True)
+        lines = ["**Commands** (slowest p95 first)"]
+        for labels, histogram in commands_by_p95[:15]:
+            key = (labels["command"], labels["cog"])
+            first_response = first_responses.get(key)
+            late = first_response.over(INTERACTION_DEADLINE) if first_response else 0
+            lines.append(
+                f"/{labels['command']}: {histogram.count} calls, p50 {format_ms(histogram.quantile(0.5))} "
+                f"p95 {format_ms(histogram.quantile(0.95))} p99 {format_ms(histogram.quantile(0.99))}, "
+                f"first response p95 {format_ms(first_response.quantile(0.95) if first_response else None)}, "
+                f"{late} over {INTERACTION_DEADLINE:.0f}s, {errors.get(key, 0)} errors"
+            )
+        if len(lines) == 1:
+            lines.append("No commands handled yet.")
+        listeners = [item for item in metrics.listener_duration.items() if item[1].count]
+        listeners_by_p95 = sorted(listeners, key=lambda item: item[1].quantile(0.95) or 0, reverse=True)
+        lines.append("**Listeners** (slowest p95 first)")
+        for labels, histogram in listeners_by_p95[:5]:
+            lines.append(f"{labels['listener']} ({labels['event']}): {histogram.count} calls, p95 {format_ms(histogram.quantile(0.95))}")
+        await ctx.respond("\n".join(lines)[:2000], ephemeral=True)
+
+    @commands.slash_command(name="reload", description="Reloads a cog, or every changed custom cog if none is given. Admin role required.")
+    @commands.has_permissions(administrator=True)
+    async def reload(
+        self,
+        ctx: discord.ApplicationContext,
+        extension: discord.Option(str, description="Cog module, e.g. weather or cogs.mycog", required=False, autocomplete=extension_autocomplete) # type: ignore
+    ):
+        await ctx.defer(ephemeral=True)
+        manager = self.bot.reload_manager
+        if extension:
+            name = manager.resolve(extension)
+            results = {name: await manager.reload(name)}
+        else:
+            results = await manager.poll()
+        if not results:
+            await ctx.respond("No cog changes found.", ephemeral=True)
+            return
+        lines = []
+        for name, error in results.items():
+            if error is not None:
+                lines.append(f"**{name}:** failed, previous version kept ({error})")
+            else:
+                lines.append(f"**{name}:** {'reloaded' if name in self.bot.extensions else 'unloaded'}")
+        await ctx.respond("\n".join(lines)[:2000], ephemeral=True)
+
+def setup(bot):
+    bot.add_cog(AdminCog(bot))
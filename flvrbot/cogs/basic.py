@@ -21,7 +21,8 @@ class BasicCog(commands.Cog):
         self,
         ctx: discord.ApplicationContext # type: ignore
         ):
-        await ctx.respond(f"PONG. Latency is {self.bot.latency:.3f}ms")
+        # bot.latency is the gateway heartbeat round trip, in seconds
+        await ctx.respond(f"PONG. Latency is {self.bot.latency * 1000:.0f}ms")
 
     @commands.slash_command(name="joined", help="Displays the join date of a member. Example: !joined @member")
     async def joined(
@@ -1,24 +1,92 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import aiohttp  # For asynchronous HTTP requests
+import asyncio
+import logging
+import os
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+# How many served fact ids are remembered so the buffer doesn't hand out repeats
+RECENT_FACTS = 500
 
 class ChuckNorrisFactsCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.session = aiohttp.ClientSession()
+        self.url = 'https://api.chucknorris.io/jokes/random'
+        self.session = None
+        self.buffer_size = int(os.getenv('CHUCKNORRIS_BUFFER_SIZE', 20))
+        self.low_water = int(os.getenv('CHUCKNORRIS_LOW_WATER', 5))
+        self.facts = deque()
+        self.recent_ids = OrderedDict()
+        self.fill_lock = asyncio.Lock()
+        self.fill_task = None
+        self.top_up.start()
 
     def cog_unload(self):
-        self.bot.loop.create_task(self.session.close())
+        self.top_up.cancel()
+        if self.session is not None and not self.session.closed:
+            self.bot.loop.create_task(self.session.close())
+
+    async def shutdown(self):
+        self.top_up.cancel()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    def get_session(self):
+        # Created on first use rather than in __init__, which runs before the event loop is up
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        return self.session
+
+    async def fetch_fact(self):
+        async with self.get_session().get(self.url) as response:
+            response.raise_for_status()
+            data = await response.json()
+            return data['id'], data['value']
+
+    def remember(self, fact_id):
+        """Record `fact_id` as buffered or served; returns False if it was seen recently."""
+        if fact_id in self.recent_ids:
+            return False
+        self.recent_ids[fact_id] = None
+        while len(self.recent_ids) > RECENT_FACTS:
+            self.recent_ids.popitem(last=False)
+        return True
+
+    async def fill(self):
+        async with self.fill_lock:
+            missing = self.buffer_size - len(self.facts)
+            if missing <= 0:
+                return
+            results = await asyncio.gather(*(self.fetch_fact() for _ in range(missing)), return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning("Failed to prefetch Chuck Norris fact: %s", result)
+                    continue
+                fact_id, fact = result
+                if len(self.facts) < self.buffer_size and self.remember(fact_id):
+                    self.facts.append(fact)
+            logger.debug("Chuck Norris buffer holds %s facts.", len(self.facts))
+
+    # Also retries a fill that failed, e.g. while the API was down
+    @tasks.loop(seconds=30)
+    async def top_up(self):
+        if len(self.facts) < self.low_water:
+            await self.fill()
 
     @discord.slash_command(name='chucknorris', description='Get a random Chuck Norris fact')
     async def chuck_norris_fact(self, ctx: discord.ApplicationContext):
-        url = 'https://api.chucknorris.io/jokes/random'
+        if self.facts:
+            await ctx.respond(self.facts.popleft())
+            if len(self.facts) < self.low_water and not self.fill_lock.locked():
+                self.fill_task = asyncio.create_task(self.fill())
+            return
         try:
-            async with self.session.get(url) as response:
-                response.raise_for_status()
-                data = await response.json()
-                chuck_fact = data['value']
-                await ctx.respond(chuck_fact)
+            fact_id, chuck_fact = await self.fetch_fact()
+            self.remember(fact_id)
+            await ctx.respond(chuck_fact)
         except aiohttp.ClientError as e:
             await ctx.respond(f'Failed to fetch Chuck Norris fact: {e}')
         except KeyError:
@@ -28,4 +96,3 @@ class ChuckNorrisFactsCog(commands.Cog):
 
 def setup(bot):
     bot.add_cog(ChuckNorrisFactsCog(bot))
-
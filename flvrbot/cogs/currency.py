@@ -1,13 +1,45 @@
 import discord
-from discord.ext import commands
-import aiohttp  # For asynchronous HTTP requests
+from discord.ext import commands, tasks
 import logging
+import os
+from datetime import datetime, timezone
+from flvrbot.rates import ExchangeRateAPISource, FixtureRateSource, RateStore
+
+async def currency_autocomplete(ctx: discord.AutocompleteContext):
+    cog = ctx.bot.get_cog("CurrencyConverter")
+    if cog is None or not await cog.rates.ensure_loaded():
+        return []
+    return [code for code in cog.rates.codes() if code.startswith(ctx.value.upper())][:25]
 
 class CurrencyConverter(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.api_url = "https://api.exchangerate-api.com/v4/latest/"
         self.logger = logging.getLogger(__name__)  # Define a logger
+        fixture = os.getenv('CURRENCY_RATES_FILE')
+        source = FixtureRateSource(fixture) if fixture else ExchangeRateAPISource()
+        self.rates = RateStore(
+            source,
+            base=os.getenv('CURRENCY_BASE', 'USD'),
+            refresh_interval=float(os.getenv('CURRENCY_REFRESH_INTERVAL', 3600)),
+        )
+        self.refresh_rates.start()
+
+    def cog_unload(self):
+        self.refresh_rates.cancel()
+        self.bot.loop.create_task(self.rates.close())
+
+    async def startup(self):
+        await self.rates.refresh()
+
+    async def shutdown(self):
+        self.refresh_rates.cancel()
+        await self.rates.close()
+
+    # Only refreshes once the table is close to expiring; a failed refresh is retried on the next tick
+    @tasks.loop(seconds=60)
+    async def refresh_rates(self):
+        if self.rates.due():
+            await self.rates.refresh()
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -18,24 +50,23 @@ class CurrencyConverter(commands.Cog):
         self,
         ctx: discord.ApplicationContext,
         value: discord.Option(float, description="Value", required=True),  # Change type to float
-        currency1: discord.Option(str, description="Currency From", required=True),  # Change type to str
-        currency2: discord.Option(str, description="Currency To", required=True)  # Change type to str
+        currency1: discord.Option(str, description="Currency From", required=True, autocomplete=currency_autocomplete),
+        currency2: discord.Option(str, description="Currency To", required=True, autocomplete=currency_autocomplete)
         ):
-        async with aiohttp.ClientSession() as session:  # Use aiohttp for asynchronous requests
-            async with session.get(f"{self.api_url}{currency1.upper()}") as response:
-                if response.status != 200:
-                    await ctx.respond("Failed to retrieve currency data. Please check the currency codes.")
-                    return
-                data = await response.json()
-                rates = data.get("rates", {})
-                rate_to = rates.get(currency2.upper())
-
-                if rate_to:
-                    converted_value = value * rate_to
-                    await ctx.respond(f"{value} {currency1.upper()} is {converted_value:.2f} {currency2.upper()}")
-                else:
-                    await ctx.respond(f"Conversion rate for {currency2.upper()} not found.")
+        if not await self.rates.ensure_loaded():
+            await ctx.respond("Failed to retrieve currency data. Please try again later.")
+            return
+        currency1, currency2 = currency1.upper(), currency2.upper()
+        converted_value = self.rates.convert(value, currency1, currency2)
+        if converted_value is None:
+            unknown = currency1 if self.rates.rate(currency1, currency1) is None else currency2
+            await ctx.respond(f"Conversion rate for {unknown} not found.")
+            return
+        response = f"{value} {currency1} is {converted_value:.2f} {currency2}"
+        if self.rates.stale():
+            updated = datetime.fromtimestamp(self.rates.updated, timezone.utc).strftime('%Y-%m-%d %H:%M UTC')
+            response += f" (rates from {updated})"
+        await ctx.respond(response)
 
 def setup(bot):
     bot.add_cog(CurrencyConverter(bot))
-
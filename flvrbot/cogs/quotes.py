@@ -1,15 +1,60 @@
 import discord
 from discord.ext import commands
-from flvrbot.db import DBManager
 import traceback
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Discord rejects messages longer than this
+MAX_MESSAGE_LENGTH = 2000
+QUOTES_PER_PAGE = 10
+
+class QuotePaginator(discord.ui.View):
+    """Pages through a guild's quotes, fetching each page only when it is requested."""
+    def __init__(self, db_manager, guild_id):
+        super().__init__(timeout=300, disable_on_timeout=True)
+        self.db_manager = db_manager
+        self.guild_id = guild_id
+        self.quotes = []
+        self.has_previous = False
+        self.has_next = False
+
+    async def load(self, after_id=None, before_id=None):
+        quotes, has_more = await self.db_manager.get_quotes_page(
+            self.guild_id, after_id=after_id, before_id=before_id, limit=QUOTES_PER_PAGE
+        )
+        if not quotes:
+            return False
+        self.quotes = quotes
+        if before_id is not None:
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = after_id is not None, has_more
+        self.previous_page.disabled = not self.has_previous
+        self.next_page.disabled = not self.has_next
+        return True
+
+    def render(self):
+        response = "\n".join([
+            f"**ID: {q['id']} - Quote:** {q['message']} - Submitter: <@{q['user_id']}> on {q['date_submitted'].strftime('%B %d, %Y at %H:%M')}"
+            for q in self.quotes
+        ])
+        return response[:MAX_MESSAGE_LENGTH]
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, button, interaction):
+        await self.load(before_id=self.quotes[0]['id'])
+        await interaction.response.edit_message(content=self.render(), view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, button, interaction):
+        await self.load(after_id=self.quotes[-1]['id'])
+        await interaction.response.edit_message(content=self.render(), view=self)
+
 class QuotesCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db_manager = DBManager()
+        self.db_manager = bot.db_manager
 
     quote_group = discord.SlashCommandGroup("quote", "Manage quotes")
 
@@ -17,28 +62,23 @@ class QuotesCog(commands.Cog):
     async def add_quote(self, ctx: discord.ApplicationContext, the_quote_to_add: str):
         user_id = ctx.author.id
         guild_id = ctx.guild.id
-        self.db_manager.add_quote(user_id, guild_id, the_quote_to_add)
+        await self.db_manager.add_quote(user_id, guild_id, the_quote_to_add)
         await ctx.respond(f"Quote added: '{the_quote_to_add}'")
 
     @quote_group.command(name="list", description="List all quotes in this guild")
     async def list_quotes(self, ctx: discord.ApplicationContext):
-        guild_id = ctx.guild.id
-        quotes = self.db_manager.get_quotes(guild_id=guild_id)
-        if quotes:
-            response = "\n".join([
-                f"**ID: {q['id']} - Quote:** {q['message']} - Submitter: <@{q['user_id']}> on {q['date_submitted'].strftime('%B %d, %Y at %H:%M')}"
-                for q in quotes
-            ])
-        else:
-            response = "No quotes found."
-        await ctx.respond(response, ephemeral=True)
+        paginator = QuotePaginator(self.db_manager, ctx.guild.id)
+        if not await paginator.load():
+            await ctx.respond("No quotes found.", ephemeral=True)
+            return
+        await ctx.respond(paginator.render(), view=paginator, ephemeral=True)
 
     @quote_group.command(name="get", description="Get a quote by ID or text search")
     async def get_quote(self, ctx: discord.ApplicationContext, identifier: str):
         guild_id = ctx.guild.id
         try:
             quote_id = int(identifier)
-            quote = self.db_manager.get_quote_by_id(quote_id, guild_id)
+            quote = await self.db_manager.get_quote_by_id(quote_id, guild_id)
             if quote:
                 await ctx.respond(
                     f"**Quote:** {quote['message']}\n**submitted by** <@{quote['user_id']}> on {quote['date_submitted'].strftime('%B %d, %Y at %H:%M')}"
@@ -46,21 +86,33 @@ class QuotesCog(commands.Cog):
             else:
                 await ctx.respond("Quote not found.", ephemeral=True)
         except ValueError:
-            quotes = self.db_manager.search_quotes_by_text(identifier, guild_id)
+            quotes = await self.db_manager.search_quotes_by_text(identifier, guild_id)
             if quotes:
-                response = "\n".join([
-                    f"**ID: {q['id']} - Quote:** {q['message']}\n**submitted by** <@{q['user_id']}> on {q['date_submitted'].strftime('%B %d, %Y at %H:%M')}"
-                    for q in quotes
-                ])
-                await ctx.respond(response)
+                response = ""
+                for q in quotes:
+                    entry = f"**ID: {q['id']} - Quote:** {q['message']}\n**submitted by** <@{q['user_id']}> on {q['date_submitted'].strftime('%B %d, %Y at %H:%M')}"
+                    if response and len(response) + len(entry) + 1 > MAX_MESSAGE_LENGTH:
+                        break
+                    response = f"{response}\n{entry}" if response else entry
+                await ctx.respond(response[:MAX_MESSAGE_LENGTH])
             else:
                 await ctx.respond("No quotes matching your search were found.", ephemeral=True)
 
+    @quote_group.command(name="random", description="Show the quote that has gone longest without being shown")
+    async def random_quote(self, ctx: discord.ApplicationContext):
+        quote = await self.db_manager.get_stalest_quote(ctx.guild.id)
+        if quote:
+            await ctx.respond(
+                f"**Quote #{quote['id']}:** {quote['message']}\n**submitted by** <@{quote['user_id']}> on {quote['date_submitted'].strftime('%B %d, %Y at %H:%M')}"
+            )
+        else:
+            await ctx.respond("No quotes found.", ephemeral=True)
+
     @quote_group.command(name="delete", description="Delete a quote by ID")
     @commands.has_permissions(administrator=True)
     async def delete_quote(self, ctx: discord.ApplicationContext, id: int):
         guild_id = ctx.guild.id
-        result = self.db_manager.delete_quote(id, guild_id)
+        result = await self.db_manager.delete_quote(id, guild_id)
         if result:
             await ctx.respond("Quote deleted successfully.", ephemeral=True)
         else:
@@ -1,7 +1,6 @@
 # cogs/rekt.py
 import discord
 from discord.ext import commands
-from flvrbot.db import DBManager
 import random
 import logging
 
@@ -10,7 +9,7 @@ class RektCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.logger = logging.getLogger(__name__)
-        self.db_manager = DBManager()
+        self.db_manager = bot.db_manager
         self.rekt_list = [
             '12 Years a Rekt', '2001: A Rekt Odyssey', 'A Game of Rekt', 'Batrekt Begins', 'Braverekt', 'Call of Rekt: Modern Reking 2',
             'Catcher in the Rekt', 'Cash4Rekt.com', 'Christopher Rektellston', 'Citizen Rekt', 'Finding Rekt', 'Fiddler on the Rekt',
@@ -54,7 +53,7 @@ class RektCog(commands.Cog):
         }
 
         for user_id, data in stats_updates.items():
-            self.db_manager.update_stats(guild_id=guild_id, user_id=user_id, module=module, data=data)
+            await self.db_manager.update_stats(guild_id=guild_id, user_id=user_id, module=module, data=data)
 
 
 def setup(bot):
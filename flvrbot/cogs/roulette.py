@@ -1,7 +1,6 @@
 import discord
 import random
 from discord.ext import commands
-from flvrbot.db import DBManager
 
 class RouletteCog(commands.Cog):
     def __init__(self, bot):
@@ -9,7 +8,7 @@ class RouletteCog(commands.Cog):
         self.chambers = 6
         self.loaded_chamber = None
         self.shot_count = 0
-        self.db_manager = DBManager()
+        self.db_manager = bot.db_manager
         # Define data map
         self.data_map = {
             "win": {"survive": 1, "death": 0},
@@ -51,7 +50,7 @@ class RouletteCog(commands.Cog):
         module = "roulette"
         data = self.data_map[result]
 
-        self.db_manager.update_stats(guild_id=guild_id, user_id=user_id, module=module, data=data)
+        await self.db_manager.update_stats(guild_id=guild_id, user_id=user_id, module=module, data=data)
 
 def setup(bot):
     bot.add_cog(RouletteCog(bot))
@@ -2,7 +2,6 @@ import discord
 import random
 import logging
 from discord.ext import commands
-from flvrbot.db import DBManager
 
 logger = logging.getLogger(__name__)
 
@@ -10,7 +9,7 @@ class SlapCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.ignored_users = ["kev2tall"]
-        self.db_manager = DBManager()
+        self.db_manager = bot.db_manager
 
     def select_article(self, word):
         return "an" if word[0] in 'aeiou' else "a"
@@ -87,7 +86,7 @@ class SlapCog(commands.Cog):
 
         await self.slap_target(ctx, slapper, target)
 
-        logger.info(f"{slapper.display_name} slapped {target.display_name}")
+        logger.info("%s slapped %s", slapper.display_name, target.display_name)
 
         # Update stats in the database
         guild_id = ctx.guild.id
@@ -98,7 +97,7 @@ class SlapCog(commands.Cog):
         }
 
         for user_id, data in stats_updates.items():
-            self.db_manager.update_stats(guild_id=guild_id, user_id=user_id, module=module, data=data)
+            await self.db_manager.update_stats(guild_id=guild_id, user_id=user_id, module=module, data=data)
 
 def setup(bot):
     bot.add_cog(SlapCog(bot))
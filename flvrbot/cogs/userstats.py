@@ -1,57 +1,88 @@
+import asyncio
 import logging
+import os
+import time
 import discord
-from discord.ext import commands
-from flvrbot.db import DBManager
+from discord.ext import commands, tasks
+from flvrbot.db import to_naive_utc
+from flvrbot.stats_buffer import UserActivityBuffer
 import pytz
 import traceback
 
 logger = logging.getLogger(__name__)
 
+async def module_autocomplete(ctx: discord.AutocompleteContext):
+    valid_modules = await ctx.bot.db_manager.get_valid_modules_and_sort_options()
+    return [module for module in sorted(valid_modules) if module.startswith(ctx.value.lower())][:25]
+
+async def sort_by_autocomplete(ctx: discord.AutocompleteContext):
+    valid_modules = await ctx.bot.db_manager.get_valid_modules_and_sort_options()
+    module = ctx.options.get("module") or "user"
+    return [key for key in sorted(valid_modules.get(module, ())) if key.startswith(ctx.value.lower())][:25]
+
 class UserStatsCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db_manager = DBManager()
+        self.db_manager = bot.db_manager
+        self.activity_buffer = UserActivityBuffer(self.db_manager)
+        # on_ready fires again after every reconnect; guilds synced within this window are skipped.
+        self.sync_interval = float(os.environ.get('USER_SYNC_INTERVAL', 3600))
+        self.sync_concurrency = int(os.environ.get('USER_SYNC_CONCURRENCY', 4))
+        self.last_synced = {}
+        self.syncing = set()
+        self.flush_activity.change_interval(seconds=float(os.environ.get('STATS_FLUSH_INTERVAL', 5)))
+        self.flush_activity.start()
+
+    def cog_unload(self):
+        self.flush_activity.cancel()
+        self.bot.loop.create_task(self.activity_buffer.flush())
+
+    async def startup(self):
+        # Warm the catalog behind /top10 and /rank autocomplete
+        await self.db_manager.load_stats_catalog()
+
+    async def shutdown(self):
+        self.flush_activity.cancel()
+        await self.activity_buffer.flush()
+
+    @tasks.loop(seconds=5)
+    async def flush_activity(self):
+        await self.activity_buffer.flush()
 
     @commands.Cog.listener()
     async def on_ready(self):
         logger.info("UserStatsCog has been loaded")
+        # When sharded, each shard's guilds were already synced by on_shard_ready and are skipped here
         await self.add_guild_users_to_db()
 
+    @commands.Cog.listener()
+    async def on_shard_ready(self, shard_id):
+        await self.add_guild_users_to_db([guild for guild in self.bot.guilds if guild.shard_id == shard_id])
+
     @commands.Cog.listener()
     async def on_message(self, message):
-        if message.author.bot:
+        if message.author.bot or message.guild is None:
             return
 
         guild_id = message.guild.id
         user_id = message.author.id
         joined_guild = message.author.joined_at.replace(tzinfo=pytz.UTC)
 
-        if not message.author.bot:  # It's a good practice to skip bots
-            existing_users = self.db_manager.get_users(guild_id, user_id)
-            if not existing_users:  # This checks if the list is empty
-                self.db_manager.add_user(guild_id=guild_id, user_id=user_id, joined_guild=joined_guild)
-
         message_content = ""
         if message.content:
             message_content = message.content
 
-        module = "user"
-        data = {
-            "messages": 1,
-            "characters": len(message_content)
-        }
-
-        self.db_manager.update_stats(guild_id=guild_id, user_id=user_id, module=module, data=data)
-        self.db_manager.update_user(guild_id=guild_id, user_id=user_id, last_seen=message.created_at)
+        # Counters and last_seen are written in bulk by flush_activity
+        self.activity_buffer.record(guild_id, user_id, joined_guild, len(message_content), message.created_at)
 
     @commands.slash_command(name="top10", description="Displays top 10 statistics for a specified module and sort_by option.")
     async def top10(
         self,
         ctx: discord.ApplicationContext,
-        module: discord.Option(str, description="Enter module to view stats", required=False, default='user'), # type: ignore
-        sort_by: discord.Option(str, description="How to sort the stats", required=False, default='messages') # type: ignore
+        module: discord.Option(str, description="Enter module to view stats", required=False, default='user', autocomplete=module_autocomplete), # type: ignore
+        sort_by: discord.Option(str, description="How to sort the stats", required=False, default='messages', autocomplete=sort_by_autocomplete) # type: ignore
     ):
-        valid_modules = self.db_manager.get_valid_modules_and_sort_options()
+        valid_modules = await self.db_manager.get_valid_modules_and_sort_options(module, sort_by)
         if module not in valid_modules:
             valid_module_keys = ", ".join(valid_modules.keys())
             await ctx.respond(f"Error, unsupported module. Try again! Valid choices are: {valid_module_keys}", ephemeral=True)
@@ -63,37 +94,73 @@ class UserStatsCog(commands.Cog):
             return
 
         guild_id = ctx.guild.id
-        stats_data = self.db_manager.get_stats(guild_id, module)
-        if not stats_data:
+        sorted_stats = await self.db_manager.get_top_stats(guild_id, module, sort_by, limit=10)
+        if not sorted_stats:
             await ctx.respond("No statistics found for the specified module.", ephemeral=True)
             return
 
-        sorted_stats = sorted(
-            stats_data.items(),
-            key=lambda x: x[1].get(sort_by, 0),
-            reverse=True
-        )[:10]  # Limit to top 10
+        result_message = f"Top 10 Statistics for **{module}** sorted by **{sort_by}**: "
+        result_message += "  ".join(f"**{index}. <@{user_id}>**: {value}" for index, (user_id, value) in enumerate(sorted_stats, start=1))
 
-        if not sorted_stats:
-            await ctx.respond("No data available for sorting.", ephemeral=True)
+        await ctx.respond(result_message)
+
+    @commands.slash_command(name="rank", description="Displays a user's position for a specified module and sort_by option.")
+    async def rank(
+        self,
+        ctx: discord.ApplicationContext,
+        user: discord.Option(discord.Member, description="Select a user to check", required=False), # type: ignore
+        module: discord.Option(str, description="Enter module to view stats", required=False, default='user', autocomplete=module_autocomplete), # type: ignore
+        sort_by: discord.Option(str, description="How to sort the stats", required=False, default='messages', autocomplete=sort_by_autocomplete) # type: ignore
+    ):
+        if user is None:
+            user = ctx.author
+
+        valid_modules = await self.db_manager.get_valid_modules_and_sort_options(module, sort_by)
+        if sort_by not in valid_modules.get(module, ()):
+            await ctx.respond(f"Unknown module or sort_by option. Valid modules are: {', '.join(valid_modules.keys())}", ephemeral=True)
             return
 
-        result_message = f"Top 10 Statistics for **{module}** sorted by **{sort_by}**: "
-        result_message += "  ".join(f"**{index}. <@{user_id}>**: {stats.get(sort_by, 0)}" for index, (user_id, stats) in enumerate(sorted_stats, start=1))
+        def pending():
+            # The user's own messages still in the activity buffer; everyone else's show up with the next flush
+            entry = self.activity_buffer.unflushed(ctx.guild.id, user.id) if module == 'user' else None
+            return entry.get(sort_by, 0) if entry else 0
 
-        await ctx.respond(result_message)
+        position = await self.db_manager.get_stat_rank(ctx.guild.id, user.id, module, sort_by, pending=pending)
+        if position is None:
+            await ctx.respond(f"No **{module}** statistics found for {user.mention}.", ephemeral=True)
+            return
 
+        rank, value, total = position
+        await ctx.respond(f"{user.mention} is ranked **#{rank}** of {total} for **{module}** by **{sort_by}** with {value}.")
 
-    async def add_guild_users_to_db(self):
+    async def add_guild_users_to_db(self, guilds=None):
         logger.info("Adding guild users to the database...")
-        for guild in self.bot.guilds:
-            for member in guild.members:
-                if not member.bot:  # It's a good practice to skip bots
-                    existing_users = self.db_manager.get_users(guild.id, member.id)
-                    if not existing_users:  # This checks if the list is empty
-                        joined_guild = member.joined_at.replace(tzinfo=pytz.UTC)
-                        self.db_manager.add_user(guild_id=guild.id, user_id=member.id, joined_guild=joined_guild)
-        logger.info("Guild users added to the database successfully.")
+        now = time.monotonic()
+        guilds = [
+            guild for guild in (guilds if guilds is not None else self.bot.guilds)
+            if guild.id not in self.syncing
+            and (guild.id not in self.last_synced or now - self.last_synced[guild.id] >= self.sync_interval)
+        ]
+        self.syncing.update(guild.id for guild in guilds)
+        semaphore = asyncio.Semaphore(self.sync_concurrency)
+
+        async def sync_guild(guild):
+            members = {
+                member.id: member.joined_at.replace(tzinfo=pytz.UTC) if member.joined_at else None
+                for member in guild.members
+                if not member.bot  # It's a good practice to skip bots
+            }
+            async with semaphore:
+                try:
+                    await self.db_manager.sync_guild_users(guild.id, members)
+                    self.last_synced[guild.id] = time.monotonic()
+                except Exception as e:
+                    logger.error("Failed to sync users for guild %s: %s", guild.id, e)
+                finally:
+                    self.syncing.discard(guild.id)
+
+        await asyncio.gather(*(sync_guild(guild) for guild in guilds))
+        logger.info("Guild users added to the database successfully for %s guilds.", len(guilds))
 
     @commands.slash_command(name="seen", description="Check when was the last time a user was seen.")
     async def seen(
@@ -105,29 +172,30 @@ class UserStatsCog(commands.Cog):
         user_id = user.id
 
         try:
-            logger.debug(f"{ctx.author.name} requested to check when {user_id} was last seen")
+            logger.debug("%s requested to check when %s was last seen", ctx.author.name, user_id)
 
+            # Taken before the read: if a flush commits meanwhile, the read sees it and the later of the two wins
+            pending = self.activity_buffer.unflushed(guild_id, user_id)
             # Retrieve user's last seen and last message
-            user_data = self.db_manager.get_users(guild_id=guild_id, user_id=user_id)
-            logger.debug(f"User data: {user_data}")
-
-            if user_data:
-                # Since user_data uses DB ids as keys, find the correct entry by user_id
-                user_entry = next((details for data, details in user_data.items() if details['user_id'] == user_id), None)
-                if user_entry:
-                    last_seen = user_entry['last_seen']
-                    if last_seen:
-                        last_seen_formatted = last_seen.strftime("%B %d, %Y at %I:%M %p UTC")
-                        message_content = f"I last saw {user.mention} on {last_seen_formatted}."
-                        await ctx.respond(message_content)
-                    else:
-                        await ctx.respond(f"I haven't seen {user.mention} before.", ephemeral=True)
+            user_data = await self.db_manager.get_users(guild_id=guild_id, user_id=user_id)
+
+            # Since user_data uses DB ids as keys, find the correct entry by user_id
+            user_entry = next((details for data, details in (user_data or {}).items() if details['user_id'] == user_id), None)
+            if user_entry or pending:
+                last_seen = user_entry['last_seen'] if user_entry else None
+                if pending and pending['last_seen'] is not None:
+                    pending_seen = to_naive_utc(pending['last_seen'])
+                    last_seen = pending_seen if last_seen is None else max(last_seen, pending_seen)
+                if last_seen:
+                    last_seen_formatted = last_seen.strftime("%B %d, %Y at %I:%M %p UTC")
+                    message_content = f"I last saw {user.mention} on {last_seen_formatted}."
+                    await ctx.respond(message_content)
                 else:
-                    await ctx.respond(f"No data found for {user.mention}.", ephemeral=True)
+                    await ctx.respond(f"I haven't seen {user.mention} before.", ephemeral=True)
             else:
                 await ctx.respond(f"No data found for {user.mention}.", ephemeral=True)
         except Exception as e:
-            logger.error(f"An unexpected error occurred: {e}")
+            logger.error("An unexpected error occurred: %s", e)
             traceback.print_exc()
 
 
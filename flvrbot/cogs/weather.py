@@ -1,18 +1,14 @@
-import json
 import discord
 from discord.ext import commands
-import requests
+import aiohttp
 import asyncio
 import logging
 import os
+import re
 from datetime import datetime, timezone
+from flvrbot.cache import MISSING, SingleFlight, TTLCache
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-handler = logging.StreamHandler()
-formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
 
 weather_emojis = {
     "Clear": "☀️", "Clouds": "☁️", "Rain": "🌧️", "Drizzle": "🌦️",
@@ -21,6 +17,14 @@ weather_emojis = {
     "Ash": "🌫️", "Squall": "🌫️", "Tornado": "🌪️"
 }
 
+# Coordinates are rounded to this many decimals (about 1km) before fetching, so nearby lookups share a cache entry
+COORDINATE_PRECISION = 2
+
+def normalize_location(location):
+    """Canonical cache key for a location, so '  Austin,TX' and 'austin, tx' share an entry."""
+    location = " ".join(location.lower().split())
+    return re.sub(r"\s*,\s*", ", ", location).strip(" ,")
+
 class WeatherCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -31,6 +35,27 @@ class WeatherCog(commands.Cog):
             logger.error("API keys are missing")
             raise RuntimeError("API keys not found in environment variables")
 
+        self.db_manager = bot.db_manager
+        # Memory tier in front of the geocode_cache table; places don't move, so entries live for a day
+        self.geocode_cache = TTLCache(int(os.getenv('GEOCODE_CACHE_SIZE', 1024)), 86400)
+        self.weather_cache = TTLCache(int(os.getenv('WEATHER_CACHE_SIZE', 256)), int(os.getenv('WEATHER_CACHE_TTL', 300)))
+        self.in_flight = SingleFlight()
+        self.session = None
+
+    def cog_unload(self):
+        if self.session is not None and not self.session.closed:
+            self.bot.loop.create_task(self.session.close())
+
+    async def shutdown(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    def get_session(self):
+        # Created on first use rather than in __init__, which runs before the event loop is up
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        return self.session
+
     @commands.Cog.listener()
     async def on_ready(self):
         logger.info("Weather Cog has been loaded.")
@@ -40,7 +65,7 @@ class WeatherCog(commands.Cog):
         description="Gets weather information for a given location"
     )
     async def weather(self, ctx, location: discord.Option(str, "Enter the location")): # type: ignore
-        logger.debug(f"Received message location: {location}")
+        logger.debug("Received message location: %s", location)
         try:
             lat, lon, address = await self.get_lat_lon(location)
             if lat is None or lon is None:
@@ -59,46 +84,82 @@ class WeatherCog(commands.Cog):
         except discord.Forbidden:
             await ctx.respond("Bot does not have the necessary permissions to perform this action.")
         except Exception as e:
-            logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+            logger.error("An unexpected error occurred: %s", e, exc_info=True)
             await ctx.respond("An unexpected error occurred. Please contact the server administrator.")
 
+    @commands.slash_command(name="weathercache", description="Purges cached geocoding results. Admin role required.")
+    @commands.has_permissions(administrator=True)
+    async def weathercache(self, ctx: discord.ApplicationContext):
+        self.geocode_cache.clear()
+        purged = await self.db_manager.purge_geocode_cache()
+        await ctx.respond(f"Purged {purged} cached locations.", ephemeral=True)
+
     async def get_lat_lon(self, location):
-        url = f"https://maps.googleapis.com/maps/api/geocode/json?address={location}&key={self.maps_api_key}"
+        query = normalize_location(location)
+        cached = self.geocode_cache.get(query)
+        if cached is not MISSING:
+            return cached
+        return await self.in_flight.do(("geocode", query), lambda: self.load_lat_lon(query, location))
+
+    async def load_lat_lon(self, query, location):
+        cached = await self.db_manager.get_geocode(query)
+        if cached is None:
+            cached = await self.geocode(location)
+            if cached[0] is None:
+                return cached
+            await self.db_manager.save_geocode(query, *cached)
+        self.geocode_cache.set(query, cached)
+        return cached
+
+    async def geocode(self, location):
+        url = "https://maps.googleapis.com/maps/api/geocode/json"
+        params = {"address": location, "key": self.maps_api_key}
         try:
-            response = await self.make_async_request(url)
-            data = response.json()
-            if response.status_code == 200 and data['status'] == 'OK':
+            status, data = await self.get_json(url, params)
+            if status == 200 and data['status'] == 'OK':
                 result = data['results'][0]
                 return result['geometry']['location']['lat'], result['geometry']['location']['lng'], result['formatted_address']
             else:
-                logger.error(f"Geocode error: {data['status']} - {data.get('error_message', '')}")
+                logger.error("Geocode error: %s - %s", data['status'], data.get('error_message', ''))
                 return None, None, None
-        except requests.RequestException as e:
-            logger.error(f"Request error during geocoding: {str(e)}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Request error during geocoding: %s", e)
             return None, None, None
 
     async def fetch_weather(self, lat, lon):
         api_version = os.getenv("WEATHER_API_VERSION", "2.5")
+        lat, lon = round(lat, COORDINATE_PRECISION), round(lon, COORDINATE_PRECISION)
+        key = (lat, lon, api_version)
+        cached = self.weather_cache.get(key)
+        if cached is not MISSING:
+            return cached
+        # Concurrent requests for the same spot wait on the first one's upstream call
+        data = await self.in_flight.do(("weather",) + key, lambda: self.request_weather(lat, lon, api_version))
+        if data is not None:
+            self.weather_cache.set(key, data)
+        return data
+
+    async def request_weather(self, lat, lon, api_version):
         base_url = "https://api.openweathermap.org/data/"
         endpoint = "onecall"
 
-        url = f"{base_url}{api_version}/{endpoint}?lat={lat}&lon={lon}&exclude=minutely,hourly&appid={self.weather_api_key}&units=metric"
+        url = f"{base_url}{api_version}/{endpoint}"
+        params = {"lat": lat, "lon": lon, "exclude": "minutely,hourly", "appid": self.weather_api_key, "units": "metric"}
         try:
-            response = await self.make_async_request(url)
-            if response.status_code == 200:
-                return response.json()
+            status, data = await self.get_json(url, params)
+            if status == 200:
+                return data
             else:
-                logger.error(f"HTTP Error {response.status_code} for weather API")
-                message = response.json()
-                logger.error(f"Output: {message['message']}")
+                logger.error("HTTP Error %s for weather API", status)
+                logger.error("Output: %s", data.get('message', ''))
                 return None
-        except requests.RequestException as e:
-            logger.error(f"Request error during weather data fetch: {str(e)}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Request error during weather data fetch: %s", e)
             return None
 
-    async def make_async_request(self, url):
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, requests.get, url)
+    async def get_json(self, url, params):
+        async with self.get_session().get(url, params=params) as response:
+            return response.status, await response.json(content_type=None)
 
     def deg_to_compass(self, num):
         val = int((num / 22.5) + 0.5)
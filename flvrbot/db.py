@@ -1,17 +1,79 @@
 # flvrbot/db.py
+import asyncio
 import logging
 import json
 import os
-from sqlalchemy import create_engine, Column, Integer, BigInteger, DateTime, JSON, Text, and_, or_
+from sqlalchemy import Column, Index, Integer, BigInteger, DateTime, Float, JSON, Text, and_, or_, select, tuple_, update, delete, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import OperationalError, SQLAlchemyError
-from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from datetime import datetime, timezone
+import time
+from flvrbot.cache import MISSING, TTLCache
+from flvrbot.leaderboard import LeaderboardIndex
+from flvrbot.querystats import QueryStats, current_method, instrumented
+from flvrbot.search import make_quote_search
 
 logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+# Keeps multi-row statements under SQLite's bound parameter limit.
+MAX_BIND_PARAMS = 800
+CHUNK_SIZE = MAX_BIND_PARAMS // 2
+# Postgres member syncs with at least this many new users use COPY instead of INSERT.
+COPY_THRESHOLD = 1000
+
+# Synchronous drivers mapped to their asyncio counterparts.
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+    'postgres': 'postgresql+asyncpg',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+}
+
+def to_async_url(db_url):
+    """Rewrite a SQLAlchemy URL so it uses an asyncio driver."""
+    url = make_url(db_url)
+    drivername = ASYNC_DRIVERS.get(url.drivername)
+    if drivername:
+        url = url.set(drivername=drivername)
+    return url
+
+def env_flag(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def get_engine_options(url):
+    """Build connection pool options for create_async_engine from the environment."""
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # In-memory SQLite lives in a single connection, there is nothing to size.
+        return {}
+    options = {
+        'poolclass': AsyncAdaptedQueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', -1)),
+        'pool_pre_ping': env_flag('DB_POOL_PRE_PING'),
+    }
+    connect_timeout = os.environ.get('DB_CONNECT_TIMEOUT')
+    if connect_timeout and url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {'timeout': float(connect_timeout)}
+    return options
+
+def to_naive_utc(value):
+    """Timestamp columns are naive UTC; asyncpg refuses timezone-aware values for them."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 class Quote(Base):
     __tablename__ = 'quotes'
 
@@ -22,6 +84,10 @@ class Quote(Base):
     date_submitted = Column(DateTime, nullable=False, default=datetime.utcnow)
     date_last_viewed = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        Index('ix_quotes_guild_id', 'guild_id', 'id'),
+    )
+
 class User(Base):
     __tablename__ = 'users'
 
@@ -31,8 +97,12 @@ class User(Base):
     user_id = Column(BigInteger)
     last_seen = Column(DateTime, default=None, nullable=True)
 
+    __table_args__ = (
+        Index('ix_users_guild_user', 'guild_id', 'user_id', unique=True),
+    )
 
 class Stats(Base):
+    """Legacy JSON blob per (guild, user, module). Rows are moved into StatCounter on startup."""
     __tablename__ = 'stats'
 
     id = Column(Integer, primary_key=True)
@@ -41,41 +111,209 @@ class Stats(Base):
     module = Column(Text)
     data = Column(JSON)
 
+class StatCounter(Base):
+    __tablename__ = 'stat_counters'
+
+    guild_id = Column(BigInteger, primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+    module = Column(Text, primary_key=True)
+    key = Column(Text, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('ix_stat_counters_guild_module_key', 'guild_id', 'module', 'key'),
+    )
+
+class Geocode(Base):
+    """Geocoding results keyed on the normalized location text users typed."""
+    __tablename__ = 'geocode_cache'
+
+    query = Column(Text, primary_key=True)
+    lat = Column(Float, nullable=False)
+    lon = Column(Float, nullable=False)
+    address = Column(Text, nullable=False)
+    date_cached = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class SchemaVersion(Base):
+    __tablename__ = 'schema_version'
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(Text, nullable=False)
+    applied_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+def quote_to_dict(quote):
+    return {
+        "id": quote.id,
+        "user_id": quote.user_id,
+        "guild_id": quote.guild_id,
+        "message": quote.message,
+        "date_submitted": quote.date_submitted,
+        "date_last_viewed": quote.date_last_viewed
+    }
+
+def legacy_stats_data(data):
+    """Decode a Stats.data value, which older releases stored double JSON encoded."""
+    while isinstance(data, str):
+        data = json.loads(data)
+    return data or {}
+
 class DBManager:
-    def __init__(self):
-        self.db_url = os.environ.get('DB_URL', 'sqlite:////tmp/flvrbot.db')
-        logger.debug(f"Our db connection string is {self.db_url}")
-        self.engine = create_engine(self.db_url)
-        self.Session = sessionmaker(bind=self.engine)
-        self.create_tables()
-
-    def create_tables(self):
-        logger.info("Creating database tables if they don't exist...")
-        try:
-            Base.metadata.create_all(self.engine)
-            logger.info("Database tables created successfully.")
-        except OperationalError as e:
-            logger.warning(f"Database tables already exist: {e}")
-
-    def execute_transaction(self, transaction_function):
-        session = self.Session()
-        try:
-            result = transaction_function(session)
-            session.commit()
-            logger.info("Transaction executed successfully.")
-            return result
-        except SQLAlchemyError as e:
-            session.rollback()
-            logger.error(f"Error executing transaction: {e}")
-            raise
-        finally:
-            session.close()
+    def __init__(self, db_url=None):
+        self.db_url = db_url or os.environ.get('DB_URL', 'sqlite:////tmp/flvrbot.db')
+        logger.debug("Our db connection string is %s", make_url(self.db_url).render_as_string(hide_password=True))
+        url = to_async_url(self.db_url)
+        self.engine_options = get_engine_options(url)
+        self.engine = create_async_engine(url, **self.engine_options)
+        self.Session = async_sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.query_stats = QueryStats(
+            slow_threshold=float(os.environ.get('DB_SLOW_QUERY_MS', 250)) / 1000,
+            repeat_threshold=int(os.environ.get('DB_REPEATED_QUERY_THRESHOLD', 10)),
+        )
+        self.query_stats.attach(self.engine)
+        self.quote_search = make_quote_search(self.engine.dialect.name)
+        self.quote_search_limit = int(os.environ.get('QUOTE_SEARCH_LIMIT', 5))
+        # Read-through cache for hot lookups, invalidated by the matching writes
+        self.cache = TTLCache(int(os.environ.get('DB_CACHE_SIZE', 4096)), float(os.environ.get('DB_CACHE_TTL', 300)))
+        self.schema_ready = False
+        self.schema_lock = asyncio.Lock()
+        # module -> set of counter keys, served to /top10 without touching the database
+        self.stats_catalog = {}
+        # Other processes sharing the database add modules and keys too, so the catalog is reloaded now and then
+        self.stats_catalog_ttl = float(os.environ.get('STATS_CATALOG_TTL', 30))
+        self.stats_catalog_loaded_at = None
+        self.stats_catalog_lock = asyncio.Lock()
+        self.leaderboards = LeaderboardIndex(self.get_stats)
+        self.pool_acquisitions = 0
+        self.pool_wait_total = 0.0
+        self.pool_wait_max = 0.0
+
+    @instrumented
+    async def migrate(self):
+        """Bring the database schema up to date. Safe to call more than once."""
+        async with self.schema_lock:
+            if self.schema_ready:
+                return
+            from flvrbot.migrations import run_migrations
+            await run_migrations(self)
+            self.schema_ready = True
+
+    async def close(self):
+        await self.engine.dispose()
+
+    def upsert_insert(self):
+        """Return the dialect insert() that supports ON CONFLICT, or None if there is none."""
+        return {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}.get(self.engine.dialect.name)
+
+    async def insert_users(self, session, rows):
+        """
+        Insert user rows in chunked multi-row statements.
+
+        With ON CONFLICT support a row for a user that already exists, for
+        example one just added by a concurrent sync, is skipped rather than
+        failing the transaction.
+        """
+        if not rows:
+            return
+        dialect_insert = self.upsert_insert()
+        if dialect_insert is None:
+            await session.execute(insert(User), rows)
+            return
+        rows_per_statement = MAX_BIND_PARAMS // len(rows[0])
+        for start in range(0, len(rows), rows_per_statement):
+            stmt = dialect_insert(User).values(rows[start:start + rows_per_statement])
+            await session.execute(stmt.on_conflict_do_nothing(index_elements=[User.guild_id, User.user_id]))
+
+    async def increment_counters(self, session, counters):
+        """
+        Add to stat counters with an atomic upsert.
+
+        `session` may be an AsyncSession or an AsyncConnection.
+        `counters` maps (guild_id, user_id, module, key) to the amount to add.
+        Postgres and SQLite use INSERT ... ON CONFLICT DO UPDATE so concurrent
+        increments never overwrite each other.
+        """
+        rows = [
+            {"guild_id": guild_id, "user_id": user_id, "module": module, "key": key, "value": value}
+            for (guild_id, user_id, module, key), value in counters.items()
+        ]
+        dialect_insert = self.upsert_insert()
+        if dialect_insert is None:
+            for row in rows:
+                result = await session.execute(
+                    update(StatCounter)
+                    .filter_by(guild_id=row["guild_id"], user_id=row["user_id"], module=row["module"], key=row["key"])
+                    .values(value=StatCounter.value + row["value"])
+                )
+                if result.rowcount == 0:
+                    await session.execute(insert(StatCounter).values(**row))
+            return
+
+        rows_per_statement = MAX_BIND_PARAMS // 5
+        for start in range(0, len(rows), rows_per_statement):
+            stmt = dialect_insert(StatCounter).values(rows[start:start + rows_per_statement])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[StatCounter.guild_id, StatCounter.user_id, StatCounter.module, StatCounter.key],
+                set_={"value": StatCounter.value + stmt.excluded.value},
+            )
+            await session.execute(stmt)
+
+    async def cached(self, key, load):
+        """Return the cached value for `key`, calling `load()` to fill it on a miss."""
+        value = self.cache.get(key)
+        if value is not MISSING:
+            return value
+        generation = self.cache.generation
+        value = await load()
+        self.cache.set(key, value, generation)
+        return value
+
+    def record_pool_wait(self, waited):
+        self.pool_acquisitions += 1
+        self.pool_wait_total += waited
+        self.pool_wait_max = max(self.pool_wait_max, waited)
+
+    def pool_status(self):
+        """Return live connection pool statistics."""
+        pool = self.engine.pool
+        status = {
+            "pool_class": type(pool).__name__,
+            "acquisitions": self.pool_acquisitions,
+            "wait_avg_ms": (self.pool_wait_total / self.pool_acquisitions * 1000) if self.pool_acquisitions else 0.0,
+            "wait_max_ms": self.pool_wait_max * 1000,
+        }
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            status.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": self.engine_options["max_overflow"],
+            })
+        return status
+
+    async def execute_transaction(self, transaction_function):
+        if not self.schema_ready:
+            await self.migrate()
+        async with self.Session() as session:
+            try:
+                started = time.perf_counter()
+                await session.connection()
+                self.record_pool_wait(time.perf_counter() - started)
+                result = await transaction_function(session)
+                await session.commit()
+                logger.debug("Transaction for %s executed successfully.", current_method.get() or 'unknown')
+                return result
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error("Error executing transaction for %s: %s", current_method.get() or 'unknown', e)
+                raise
 
     # user table CRUD
-    def get_users(self, guild_id=None, user_id=None):
-        logger.info("Fetching users from database...")
-        def transaction(session):
-            query = session.query(User)
+    @instrumented
+    async def get_users(self, guild_id=None, user_id=None):
+        logger.debug("Fetching users from database...")
+        async def transaction(session):
+            query = select(User)
             if guild_id is not None:
                 query = query.filter_by(guild_id=guild_id)
             if user_id is not None:
@@ -85,77 +323,221 @@ class DBManager:
                 "user_id": user.user_id,
                 "guild_id": user.guild_id,
                 "last_seen": user.last_seen
-            } for user in query.all()}
-            logger.debug(f"Result: {result}")
+            } for user in (await session.scalars(query)).all()}
+            logger.debug("Fetched %d users.", len(result))
             return result
-        return self.execute_transaction(transaction)
+        if guild_id is None or user_id is None:
+            return await self.execute_transaction(transaction)
+        return await self.cached(("get_users", guild_id, user_id), lambda: self.execute_transaction(transaction))
 
-    def add_user(self, guild_id, user_id, joined_guild):
-        logger.info("Adding user to database...")
-        def transaction(session):
-            user = User(guild_id=guild_id, user_id=user_id, guild_joined=joined_guild)
+    @instrumented
+    async def add_user(self, guild_id, user_id, joined_guild):
+        logger.debug("Adding user to database...")
+        async def transaction(session):
+            user = User(guild_id=guild_id, user_id=user_id, guild_joined=to_naive_utc(joined_guild))
             session.add(user)
-            logger.info("User added successfully.")
-        self.execute_transaction(transaction)
+            logger.debug("User added successfully.")
+        await self.execute_transaction(transaction)
+        self.cache.discard(("get_users", guild_id, user_id))
+
+    @instrumented
+    async def sync_guild_users(self, guild_id, members):
+        """
+        Insert every member of a guild that is not in the users table yet.
+
+        `members` maps user_id to the time they joined the guild. Existing ids are
+        read in one query and only the difference is written, in chunked multi-row
+        inserts, or with COPY on Postgres for large batches. Returns the number of
+        users added.
+        """
+        logger.info("Syncing %s members of guild %s...", len(members), guild_id)
+        dialect = self.engine.dialect.name
+        async def transaction(session, use_copy):
+            existing = set((await session.scalars(select(User.user_id).filter_by(guild_id=guild_id))).all())
+            missing = [
+                {"guild_id": guild_id, "user_id": user_id, "guild_joined": to_naive_utc(joined_guild)}
+                for user_id, joined_guild in members.items() if user_id not in existing
+            ]
+            if not missing:
+                return 0
+            if use_copy and len(missing) >= COPY_THRESHOLD:
+                conn = await session.connection()
+                raw_connection = await conn.get_raw_connection()
+                await raw_connection.driver_connection.copy_records_to_table(
+                    User.__tablename__,
+                    records=[(row["guild_id"], row["user_id"], row["guild_joined"]) for row in missing],
+                    columns=["guild_id", "user_id", "guild_joined"],
+                )
+            else:
+                # A user created by on_message while we ran is not an error.
+                await self.insert_users(session, missing)
+            logger.info("Added %s users for guild %s.", len(missing), guild_id)
+            self.cache.discard(*(("get_users", guild_id, row["user_id"]) for row in missing))
+            return len(missing)
+
+        if dialect == 'postgresql' and len(members) >= COPY_THRESHOLD:
+            try:
+                return await self.execute_transaction(lambda session: transaction(session, use_copy=True))
+            except Exception as e:
+                # COPY has no ON CONFLICT, so a concurrent insert of the same user aborts it.
+                logger.warning("COPY sync of guild %s failed, retrying with inserts: %s", guild_id, e)
+        return await self.execute_transaction(lambda session: transaction(session, use_copy=False))
 
-    def update_user(self, user_id, guild_id, last_seen=None):
-        logger.info("Updating user...")
-        def transaction(session):
-            user = session.query(User).filter_by(user_id=user_id, guild_id=guild_id).first()
+    @instrumented
+    async def update_user(self, user_id, guild_id, last_seen=None):
+        logger.debug("Updating user...")
+        async def transaction(session):
+            user = (await session.scalars(select(User).filter_by(user_id=user_id, guild_id=guild_id))).first()
             if user:
                 if last_seen is not None:
-                    user.last_seen = last_seen
-                logger.info("User updated successfully.")
+                    user.last_seen = to_naive_utc(last_seen)
+                logger.debug("User updated successfully.")
             else:
-                logger.warning(f"User with user_id {user_id} and guild_id {guild_id} not found.")
-        self.execute_transaction(transaction)
+                logger.warning("User with user_id %s and guild_id %s not found.", user_id, guild_id)
+        await self.execute_transaction(transaction)
+        self.cache.discard(("get_users", guild_id, user_id))
+
+    @instrumented
+    async def apply_user_activity(self, activity):
+        """
+        Write buffered on_message activity in a single transaction.
+
+        `activity` maps (guild_id, user_id) to a dict with joined_guild,
+        messages, characters and last_seen. Missing users are created, last_seen
+        is moved forward and the "user" stats module is incremented.
+        """
+        logger.debug("Applying buffered activity for %s users...", len(activity))
+        async def transaction(session):
+            keys = list(activity)
+            users = {}
+            for start in range(0, len(keys), CHUNK_SIZE):
+                chunk = keys[start:start + CHUNK_SIZE]
+                for user in (await session.scalars(select(User).where(tuple_(User.guild_id, User.user_id).in_(chunk)))).all():
+                    users.setdefault((user.guild_id, user.user_id), user)
+
+            new_users = []
+            last_seen_updates = []
+            counters = {}
+            for (guild_id, user_id), entry in activity.items():
+                last_seen = to_naive_utc(entry["last_seen"])
+                user = users.get((guild_id, user_id))
+                if user is None:
+                    new_users.append({"guild_id": guild_id, "user_id": user_id,
+                                      "guild_joined": to_naive_utc(entry["joined_guild"]), "last_seen": last_seen})
+                elif last_seen is not None and (user.last_seen is None or last_seen > user.last_seen):
+                    last_seen_updates.append({"id": user.id, "last_seen": last_seen})
+
+                counters[(guild_id, user_id, "user", "messages")] = entry["messages"]
+                counters[(guild_id, user_id, "user", "characters")] = entry["characters"]
+
+            # One statement per chunk, and a user inserted by a concurrent sync_guild_users is skipped
+            await self.insert_users(session, new_users)
+            if last_seen_updates:
+                await session.execute(update(User), last_seen_updates)
+            await self.increment_counters(session, counters)
+            logger.debug("Buffered activity applied successfully.")
+            return counters
+        counters = await self.execute_transaction(transaction)
+        self.cache.discard(*(("get_users", guild_id, user_id) for guild_id, user_id in activity))
+        self.counters_applied(counters)
 
     # stats CRUD
-    def update_stats(self, guild_id, user_id, module, data):
-        logger.info("Updating stats.")
-        def transaction(session):
-            stats = session.query(Stats).filter_by(guild_id=guild_id, user_id=user_id, module=module).first()
-            existing_data = json.loads(stats.data) if stats and stats.data else {}  # Load existing data as dictionary
-            for key, value in data.items():
-                existing_data[key] = existing_data.get(key, 0) + value
-            if stats:
-                stats.data = json.dumps(existing_data)  # Convert the updated data back to JSON format
-            else:
-                stats = Stats(guild_id=guild_id, user_id=user_id, module=module, data=json.dumps(existing_data))
-                session.add(stats)
-            logger.info("Stats updated successfully.")
-        self.execute_transaction(transaction)
-
-    def get_stats(self, guild_id, module=None):
-        logger.info("Fetching stats...")
-        def transaction(session):
-            stats = session.query(Stats).filter_by(guild_id=guild_id, module=module).all()
+    @instrumented
+    async def update_stats(self, guild_id, user_id, module, data):
+        logger.debug("Updating stats.")
+        async def transaction(session):
+            counters = {(guild_id, user_id, module, key): value for key, value in data.items()}
+            await self.increment_counters(session, counters)
+            logger.debug("Stats updated successfully.")
+            return counters
+        counters = await self.execute_transaction(transaction)
+        self.counters_applied(counters)
+
+    @instrumented
+    async def get_stats(self, guild_id, module=None):
+        logger.debug("Fetching stats...")
+        async def transaction(session):
+            query = select(StatCounter.user_id, StatCounter.key, StatCounter.value).filter_by(guild_id=guild_id, module=module)
+            stats = {}
+            for user_id, key, value in (await session.execute(query)).all():
+                stats.setdefault(user_id, {})[key] = value
             if stats:
-                logger.info("Stats fetched successfully.")
-                return {stat.user_id: json.loads(stat.data) for stat in stats}
+                logger.debug("Stats fetched successfully.")
             else:
-                logger.warning(f"No stats found for guild_id {guild_id}, and module {module}.")
-                return {}
-        return self.execute_transaction(transaction)
-
-    def get_valid_modules_and_sort_options(self):
-        logger.info("Fetching valid modules and sort options...")
-        def transaction(session):
-            results = session.query(Stats.module, Stats.data).all()
-            valid_modules = {}
-            for module, data in results:
-                data_keys = json.loads(data).keys()
-                if module in valid_modules:
-                    valid_modules[module].update(data_keys)
-                else:
-                    valid_modules[module] = set(data_keys)
-            return valid_modules
-        return self.execute_transaction(transaction)
+                logger.warning("No stats found for guild_id %s, and module %s.", guild_id, module)
+            return stats
+        return await self.cached(("get_stats", guild_id, module), lambda: self.execute_transaction(transaction))
+
+    def counters_applied(self, counters):
+        """Keep in-memory views of stat_counters current after a committed increment."""
+        self.cache.discard(*{("get_stats", guild_id, module) for guild_id, user_id, module, key in counters})
+        for (guild_id, user_id, module, key), value in counters.items():
+            self.stats_catalog.setdefault(module, set()).add(key)
+        self.leaderboards.apply(counters)
+
+    @instrumented
+    async def load_stats_catalog(self, since=None):
+        """Read the catalog from stat_counters, unless a load that started at or after `since` (a time.monotonic()) has finished."""
+        async with self.stats_catalog_lock:
+            # Callers that queued up behind a load share the next one
+            if since is not None and self.stats_catalog_loaded_at is not None and self.stats_catalog_loaded_at >= since:
+                return
+            logger.debug("Loading stats catalog...")
+            loaded_at = time.monotonic()
+            async def transaction(session):
+                return (await session.execute(select(StatCounter.module, StatCounter.key).distinct())).all()
+            for module, key in await self.execute_transaction(transaction):
+                self.stats_catalog.setdefault(module, set()).add(key)
+            self.stats_catalog_loaded_at = loaded_at
+
+    @instrumented
+    async def get_valid_modules_and_sort_options(self, module=None, key=None):
+        """
+        Return {module: {keys}} for every stats module, read from the in-memory catalog.
+
+        The catalog is reloaded once it is STATS_CATALOG_TTL seconds old, and
+        before `module` (and `key`, if given) are reported missing from it, in
+        case another process wrote them since the last load.
+        """
+        now = time.monotonic()
+        if self.stats_catalog_loaded_at is None or now - self.stats_catalog_loaded_at >= self.stats_catalog_ttl:
+            await self.load_stats_catalog(since=now - self.stats_catalog_ttl)
+        elif module is not None and (module not in self.stats_catalog or (key is not None and key not in self.stats_catalog[module])):
+            await self.load_stats_catalog(since=now)
+        return {module: set(keys) for module, keys in self.stats_catalog.items()}
+
+    @instrumented
+    async def get_top_stats(self, guild_id, module, key, limit=10):
+        """Return [(user_id, value)] for the highest `key` counters of a guild's module."""
+        board = await self.leaderboards.get(guild_id, module, key)
+        return board.top(limit) if board else []
+
+    @instrumented
+    async def get_stat_rank(self, guild_id, user_id, module, key, pending=None):
+        """
+        Return (rank, value, total) for a user on a guild leaderboard, or None if they have no entry.
+
+        `pending`, if given, is called once the leaderboard is current and
+        returns an amount not committed yet to add to the user's value. It is
+        called then rather than passed in so that a commit during the
+        leaderboard load is not counted twice.
+        """
+        board = await self.leaderboards.get(guild_id, module, key)
+        amount = pending() if pending is not None else 0
+        if board is None:
+            if not amount:
+                return None
+            return 1, amount, 1
+        position = board.rank(user_id, amount)
+        if position is None:
+            return None
+        return position[0], position[1], len(board) + (user_id not in board.values)
 
     # Quote CRUD
-    def add_quote(self, user_id, guild_id, message):
-        logger.info("Adding new quote to the database...")
-        def transaction(session):
+    @instrumented
+    async def add_quote(self, user_id, guild_id, message):
+        logger.debug("Adding new quote to the database...")
+        async def transaction(session):
             quote = Quote(
                 user_id=user_id, 
                 guild_id=guild_id, 
@@ -163,82 +545,173 @@ class DBManager:
                 date_submitted=datetime.utcnow()
             )
             session.add(quote)
-            logger.info("Quote added successfully.")
-        self.execute_transaction(transaction)
+            await session.flush()
+            await self.quote_search.index(session, quote.id, guild_id, message)
+            logger.debug("Quote added successfully.")
+        await self.execute_transaction(transaction)
 
-    def get_quotes(self, user_id=None, guild_id=None):
-        logger.info("Fetching quotes from database...")
-        def transaction(session):
-            query = session.query(Quote)
+    @instrumented
+    async def get_quotes(self, user_id=None, guild_id=None):
+        logger.debug("Fetching quotes from database...")
+        async def transaction(session):
+            query = select(Quote)
             if guild_id:
                 query = query.filter_by(guild_id=guild_id)
             if user_id:
                 query = query.filter_by(user_id=user_id)
-            result = [{
-                "id": quote.id,
-                "user_id": quote.user_id,
-                "guild_id": quote.guild_id,
-                "message": quote.message,
-                "date_submitted": quote.date_submitted,
-                "date_last_viewed": quote.date_last_viewed
-            } for quote in query.all()]
-            logger.debug(f"Quotes fetched: {result}")
+            result = [quote_to_dict(quote) for quote in (await session.scalars(query)).all()]
+            logger.debug("Fetched %s quotes.", len(result))
             return result
-        return self.execute_transaction(transaction)
+        return await self.execute_transaction(transaction)
+
+    @instrumented
+    async def get_quotes_page(self, guild_id, after_id=None, before_id=None, limit=10):
+        """
+        Return one page of a guild's quotes ordered by id, using keyset pagination.
+
+        Pass the last id of the current page as `after_id` for the next page, or
+        the first id as `before_id` for the previous one. Returns (quotes, has_more)
+        where has_more says whether another page exists in that direction.
+        """
+        logger.debug("Fetching a page of quotes...")
+        async def transaction(session):
+            query = select(Quote).filter_by(guild_id=guild_id)
+            if before_id is not None:
+                query = query.where(Quote.id < before_id).order_by(Quote.id.desc())
+            else:
+                if after_id is not None:
+                    query = query.where(Quote.id > after_id)
+                query = query.order_by(Quote.id)
+            quotes = (await session.scalars(query.limit(limit + 1))).all()
+            has_more = len(quotes) > limit
+            quotes = quotes[:limit]
+            if before_id is not None:
+                quotes.reverse()
+            return [quote_to_dict(quote) for quote in quotes], has_more
+        return await self.execute_transaction(transaction)
+
+    @instrumented
+    async def get_stalest_quote(self, guild_id):
+        """
+        Return the guild's least recently shown quote and mark it as shown now.
+
+        Never shown quotes come first. The pick and the timestamp update happen in
+        one transaction, and on Postgres SKIP LOCKED keeps concurrent callers from
+        getting the same quote.
+        """
+        logger.debug("Fetching least recently viewed quote...")
+        async def transaction(session):
+            query = (select(Quote).filter_by(guild_id=guild_id)
+                     .order_by(Quote.date_last_viewed.asc().nulls_first(), Quote.id)
+                     .limit(1).with_for_update(skip_locked=True))
+            quote = (await session.scalars(query)).first()
+            if quote is None:
+                return None
+            quote.date_last_viewed = datetime.utcnow()
+            return quote_to_dict(quote)
+        quote = await self.execute_transaction(transaction)
+        if quote:
+            self.cache.discard(("get_quote_by_id", quote["id"], guild_id))
+        return quote
 
-    def update_quote_last_viewed(self, quote_id, last_viewed_time):
-        logger.info("Updating quote's last viewed date...")
-        def transaction(session):
-            quote = session.query(Quote).filter_by(id=quote_id).first()
+    @instrumented
+    async def update_quote_last_viewed(self, quote_id, last_viewed_time):
+        logger.debug("Updating quote's last viewed date...")
+        async def transaction(session):
+            quote = await session.get(Quote, quote_id)
             if quote:
-                quote.date_last_viewed = last_viewed_time
-                logger.info("Quote last viewed date updated successfully.")
+                quote.date_last_viewed = to_naive_utc(last_viewed_time)
+                logger.debug("Quote last viewed date updated successfully.")
+                return quote.guild_id
             else:
-                logger.warning(f"Quote with id {quote_id} not found.")
-        self.execute_transaction(transaction)
+                logger.warning("Quote with id %s not found.", quote_id)
+        guild_id = await self.execute_transaction(transaction)
+        self.cache.discard(("get_quote_by_id", quote_id, guild_id))
 
-    def get_quote_by_id(self, quote_id, guild_id):
-        logger.info("Fetching quote by ID...")
-        def transaction(session):
-            quote = session.query(Quote).filter(and_(Quote.id == quote_id, Quote.guild_id == guild_id)).first()
+    @instrumented
+    async def get_quote_by_id(self, quote_id, guild_id):
+        logger.debug("Fetching quote by ID...")
+        async def transaction(session):
+            quote = (await session.scalars(select(Quote).filter(and_(Quote.id == quote_id, Quote.guild_id == guild_id)))).first()
             if quote:
-                return {
-                    "id": quote.id,
-                    "user_id": quote.user_id,
-                    "guild_id": quote.guild_id,
-                    "message": quote.message,
-                    "date_submitted": quote.date_submitted,
-                    "date_last_viewed": quote.date_last_viewed
-                }
+                return quote_to_dict(quote)
             else:
                 return None
-        return self.execute_transaction(transaction)
-
-    def search_quotes_by_text(self, text, guild_id):
-        logger.info("Searching quotes by text...")
-        def transaction(session):
-            pattern = f"%{text}%"
-            quotes = session.query(Quote).filter(and_(Quote.message.like(pattern), Quote.guild_id == guild_id)).all()
-            return [{
-                "id": quote.id,
-                "user_id": quote.user_id,
-                "guild_id": quote.guild_id,
-                "message": quote.message,
-                "date_submitted": quote.date_submitted,
-                "date_last_viewed": quote.date_last_viewed
-            } for quote in quotes]
-        return self.execute_transaction(transaction)
-
-    def delete_quote(self, quote_id, guild_id):
-        logger.info("Deleting a quote from the database...")
-        def transaction(session):
-            quote = session.query(Quote).filter_by(id=quote_id, guild_id=guild_id).first()
+        return await self.cached(("get_quote_by_id", quote_id, guild_id), lambda: self.execute_transaction(transaction))
+
+    @instrumented
+    async def search_quotes_by_text(self, text, guild_id, limit=None):
+        """Return up to `limit` quotes matching `text` in a guild, most relevant first."""
+        logger.debug("Searching quotes by text...")
+        async def transaction(session):
+            quote_ids = await self.quote_search.search(session, guild_id, text, limit or self.quote_search_limit)
+            if not quote_ids:
+                return []
+            quotes = {quote.id: quote for quote in (await session.scalars(select(Quote).where(Quote.id.in_(quote_ids)))).all()}
+            quotes = [quotes[quote_id] for quote_id in quote_ids if quote_id in quotes]
+            return [quote_to_dict(quote) for quote in quotes]
+        return await self.execute_transaction(transaction)
+
+    @instrumented
+    async def delete_quote(self, quote_id, guild_id):
+        logger.debug("Deleting a quote from the database...")
+        async def transaction(session):
+            quote = (await session.scalars(select(Quote).filter_by(id=quote_id, guild_id=guild_id))).first()
             if quote:
-                session.delete(quote)
-                logger.info("Quote deleted successfully.")
+                await self.quote_search.remove(session, quote.id, quote.guild_id, quote.message)
+                await session.delete(quote)
+                logger.debug("Quote deleted successfully.")
                 return True
             else:
-                logger.warning(f"Quote with ID {quote_id} in guild {guild_id} not found.")
+                logger.warning("Quote with ID %s in guild %s not found.", quote_id, guild_id)
                 return False
-        return self.execute_transaction(transaction)
+        deleted = await self.execute_transaction(transaction)
+        self.cache.discard(("get_quote_by_id", quote_id, guild_id))
+        return deleted
+
+
+    # Geocode cache CRUD
+    @instrumented
+    async def get_geocode(self, query):
+        logger.debug("Fetching cached geocode...")
+        async def transaction(session):
+            geocode = await session.get(Geocode, query)
+            if geocode:
+                return geocode.lat, geocode.lon, geocode.address
+            return None
+        return await self.execute_transaction(transaction)
+
+    @instrumented
+    async def save_geocode(self, query, lat, lon, address):
+        logger.debug("Saving geocode to cache...")
+        async def transaction(session):
+            values = {"query": query, "lat": lat, "lon": lon, "address": address, "date_cached": datetime.utcnow()}
+            dialect_insert = self.upsert_insert()
+            if dialect_insert is None:
+                await session.merge(Geocode(**values))
+                return
+            stmt = dialect_insert(Geocode).values(**values)
+            await session.execute(stmt.on_conflict_do_update(
+                index_elements=[Geocode.query],
+                set_={key: stmt.excluded[key] for key in ("lat", "lon", "address", "date_cached")},
+            ))
+        await self.execute_transaction(transaction)
+
+    @instrumented
+    async def purge_geocode_cache(self):
+        logger.debug("Purging geocode cache...")
+        async def transaction(session):
+            result = await session.execute(delete(Geocode))
+            return result.rowcount
+        return await self.execute_transaction(transaction)
+
+
+# One DBManager (and so one engine and connection pool) per database URL for the whole process.
+db_managers = {}
 
+def get_db_manager(db_url=None):
+    """Return the shared DBManager for `db_url`, creating it on first use."""
+    db_url = db_url or os.environ.get('DB_URL', 'sqlite:////tmp/flvrbot.db')
+    if db_url not in db_managers:
+        db_managers[db_url] = DBManager(db_url)
+    return db_managers[db_url]
@@ -0,0 +1,112 @@
+# flvrbot/leaderboard.py
+import asyncio
+import logging
+from sortedcontainers import SortedList
+
+logger = logging.getLogger(__name__)
+
+# How many times a seed is retried when increments land while it is being read.
+SEED_ATTEMPTS = 3
+
+class Leaderboard:
+    """Users of one guild ordered by a single stat counter, highest first."""
+    def __init__(self):
+        self.values = {}
+        # (-value, user_id) so the largest value sorts first and ties are stable
+        self.ranking = SortedList()
+
+    def __len__(self):
+        return len(self.values)
+
+    def increment(self, user_id, amount):
+        current = self.values.get(user_id)
+        if current is not None:
+            self.ranking.remove((-current, user_id))
+        value = (current or 0) + amount
+        self.values[user_id] = value
+        self.ranking.add((-value, user_id))
+
+    def top(self, limit):
+        return [(user_id, -negated) for negated, user_id in self.ranking.islice(0, limit)]
+
+    def rank(self, user_id, pending=0):
+        """
+        Return the 1-based position and value of `user_id`, or None if it has no entry.
+
+        `pending` is added to the user's value first, for an increment that
+        has not been committed yet.
+        """
+        current = self.values.get(user_id)
+        if current is None and not pending:
+            return None
+        value = (current or 0) + pending
+        # Everyone sorting before the user's new entry; their own entry never does, as pending is not negative
+        return self.ranking.bisect_left((-value, user_id)) + 1, value
+
+class LeaderboardIndex:
+    """
+    Per (guild, module, key) leaderboards kept in memory.
+
+    A guild's module is seeded from the database on first use and from then
+    on kept current by `apply`, which DBManager calls after every committed
+    counter increment.
+    """
+    def __init__(self, load_stats):
+        self.load_stats = load_stats
+        self.boards = {}
+        self.seeded = set()
+        self.seed_locks = {}
+        self.seeding = set()
+        self.dirty = set()
+
+    def apply(self, counters):
+        for (guild_id, user_id, module, key), amount in counters.items():
+            if (guild_id, module) in self.seeded:
+                self.boards.setdefault((guild_id, module, key), Leaderboard()).increment(user_id, amount)
+            elif (guild_id, module) in self.seeding:
+                # The seed in progress may have read the table before this increment committed.
+                self.dirty.add((guild_id, module))
+
+    async def seed(self, guild_id, module):
+        """
+        Load a guild's module from the database and keep it current from then on.
+
+        Returns None once seeded. If increments kept landing during every
+        read, the last read is returned as {key: Leaderboard} without being
+        kept, and the next call tries again.
+        """
+        lock = self.seed_locks.setdefault((guild_id, module), asyncio.Lock())
+        async with lock:
+            if (guild_id, module) in self.seeded:
+                return None
+            self.seeding.add((guild_id, module))
+            try:
+                for attempt in range(SEED_ATTEMPTS):
+                    self.dirty.discard((guild_id, module))
+                    stats = await self.load_stats(guild_id, module)
+                    if (guild_id, module) not in self.dirty:
+                        break
+                    logger.debug("Stats for guild %s module %s changed while seeding, reloading.", guild_id, module)
+            finally:
+                self.seeding.discard((guild_id, module))
+            boards = {}
+            for user_id, data in stats.items():
+                for key, value in data.items():
+                    boards.setdefault(key, Leaderboard()).increment(user_id, value)
+            if (guild_id, module) in self.dirty:
+                # The read may be missing an increment that apply() could not add, so the boards are not kept
+                self.dirty.discard((guild_id, module))
+                logger.warning("Stats for guild %s module %s kept changing while seeding; will seed again on next use.",
+                               guild_id, module)
+                return boards
+            for key, board in boards.items():
+                self.boards[(guild_id, module, key)] = board
+            self.seeded.add((guild_id, module))
+            return None
+
+    async def get(self, guild_id, module, key):
+        if (guild_id, module) not in self.seeded:
+            unkept = await self.seed(guild_id, module)
+            if unkept is not None:
+                return unkept.get(key)
+        return self.boards.get((guild_id, module, key))
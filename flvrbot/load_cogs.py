@@ -1,8 +1,32 @@
+import asyncio
 import logging
 import os
+import time
 
 logger = logging.getLogger(__name__)
 
+# Seconds a command waits on its cog's startup() before acknowledging the interaction, which Discord expires after 3s
+DEFER_AFTER = 1.0
+
+class TimedLoader:
+    """Wraps a module's loader so the module import is timed separately from the cog's setup()."""
+    def __init__(self, loader, record):
+        self.loader = loader
+        self.record = record
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        started = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.record(time.perf_counter() - started)
+
 class CogLoader:
     def __init__(self, bot):
         """
@@ -12,6 +36,16 @@ class CogLoader:
             bot: The Discord bot instance.
         """
         self.bot = bot
+        # {extension: {"import": seconds, "setup": seconds, "init": seconds}}
+        self.profile = {}
+        # Cogs whose startup() waits for the first use of one of their commands instead of running at boot
+        self.lazy = {name.strip() for name in os.environ.get('LAZY_COGS', 'unitconvert').split(',') if name.strip()}
+        self.initialized = set()
+        self.init_locks = {}
+        self.failed = set()
+
+    def is_lazy(self, extension):
+        return extension in self.lazy or extension.rsplit('.', 1)[-1] in self.lazy
 
     def load_cogs(self):
         """
@@ -21,6 +55,7 @@ class CogLoader:
 
         # Load built-in cogs
         predefined_cogs = [
+            'flvrbot.cogs.admin',
             'flvrbot.cogs.basic',
             'flvrbot.cogs.unitconvert',
             'flvrbot.cogs.rekt',
@@ -34,11 +69,7 @@ class CogLoader:
             'flvrbot.cogs.weather'
         ]
         for cog_name in predefined_cogs:
-            try:
-                self.bot.load_extension(cog_name)
-                logger.info(f"Loaded cog module: {cog_name}")
-            except Exception as e:
-                logger.error(f"Failed to load cog module: {cog_name}. Error: {e}")
+            self.load_extension(cog_name)
 
         # Check if /app/cogs directory exists -- this is for custom cogs.
         cogs_directory = '/app/cogs'
@@ -48,15 +79,87 @@ class CogLoader:
                 if filename.endswith('.py') and filename != '__init__.py':
                     cog_path = f'cogs.{filename[:-3]}'
                     logger.debug("Attempting to load cog module: %s", cog_path)
-                    try:
-                        self.bot.load_extension(cog_path)
-                        logger.info(f"Loaded cog module: {cog_path}")
-                    except Exception as e:
-                        logger.error(f"Failed to load cog module: {cog_path}. Error: {e}")
+                    self.load_extension(cog_path)
         else:
             logger.info("Directory '/app/cogs' does not exist. No additional cogs loaded.")
 
+    def load_extension(self, name):
+        self.profile[name] = {}
+        self.failed.discard(name)
+        started = time.perf_counter()
+        try:
+            self.bot.load_extension(name)
+        except Exception as e:
+            logger.error("Failed to load cog module: %s. Error: %s", name, e)
+            self.failed.add(name)
+            return False
+        entry = self.profile[name]
+        entry["setup"] = time.perf_counter() - started - entry.get("import", 0)
+        logger.info("Loaded cog module: %s", name)
+        return True
+
+    def time_import(self, spec, key):
+        """Called by FlvrBot for every extension spec py-cord is about to load."""
+        def record(elapsed):
+            self.profile.setdefault(key, {})["import"] = elapsed
+        spec.loader = TimedLoader(spec.loader, record)
+
+    async def initialize(self):
+        """Run the startup() hook of every cog that isn't lazy, all at once."""
+        cogs = [cog for cog in self.bot.cogs.values() if not self.is_lazy(cog.__module__)]
+        await asyncio.gather(*(self.initialize_cog(cog) for cog in cogs))
+
+    async def initialize_cog(self, cog):
+        startup = getattr(cog, "startup", None)
+        if startup is None or cog.qualified_name in self.initialized:
+            return
+        lock = self.init_locks.setdefault(cog.qualified_name, asyncio.Lock())
+        async with lock:
+            if cog.qualified_name in self.initialized:
+                return
+            started = time.perf_counter()
+            try:
+                await startup()
+            except Exception as e:
+                # Not marked initialized, so a lazy cog tries again on its next command
+                logger.error("Startup of cog %s failed: %s", cog.qualified_name, e, exc_info=True)
+                return
+            finally:
+                self.profile.setdefault(cog.__module__, {})["init"] = time.perf_counter() - started
+            self.initialized.add(cog.qualified_name)
+
+    async def before_invoke(self, ctx):
+        """
+        Global before-invoke hook: a command waits until its cog's startup() is done.
+
+        That initializes a lazy cog the first time one of its commands runs,
+        and holds commands that arrive while FlvrBot.start is still running
+        the startup hooks alongside the gateway connection.
+        """
+        if ctx.cog is None or ctx.cog.qualified_name in self.initialized:
+            return
+        initializing = asyncio.ensure_future(self.initialize_cog(ctx.cog))
+        try:
+            await asyncio.wait_for(asyncio.shield(initializing), DEFER_AFTER)
+        except asyncio.TimeoutError:
+            response = getattr(ctx, "response", None)
+            if response is not None and not response.is_done():
+                await ctx.defer()
+            await initializing
+
+    def report(self):
+        """Lines of the startup profile, slowest cog first."""
+        lines = []
+        totals = {name: sum(entry.values()) for name, entry in self.profile.items()}
+        for name in sorted(totals, key=totals.get, reverse=True):
+            entry = self.profile[name]
+            phases = " ".join(f"{phase} {entry[phase] * 1000:.1f}ms" for phase in ("import", "setup", "init") if phase in entry)
+            status = " (failed)" if name in self.failed else " (lazy)" if self.is_lazy(name) else ""
+            lines.append(f"{name}: {phases or 'no timings'}{status}")
+        lines.append(f"Total: {sum(totals.values()) * 1000:.1f}ms across {len(self.profile)} cogs")
+        return lines
+
 def setup(bot):
     cog_loader = CogLoader(bot)
     cog_loader.load_cogs()
-
+    return cog_loader
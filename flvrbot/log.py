@@ -0,0 +1,162 @@
+# flvrbot/log.py
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+def parse_rules(spec, parse):
+    """Parse "logger=value,other.logger=value" into {logger: parse(value)}."""
+    rules = {}
+    for item in (spec or "").split(","):
+        name, _, value = item.strip().partition("=")
+        if name and value:
+            rules[name] = parse(value)
+    return rules
+
+def parse_rate(value):
+    """"20/60" is 20 messages per 60 seconds; a bare number is per second."""
+    count, _, period = value.partition("/")
+    return int(count), float(period or 1)
+
+def match_rule(rules, name):
+    """The rule for the logger `name` or its nearest configured ancestor."""
+    while name:
+        if name in rules:
+            return rules[name]
+        name = name.rpartition(".")[0]
+    return rules.get("root")
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+class LogLimiter(logging.Filter):
+    """
+    Rate limits and samples records below WARNING, per logger.
+
+    `rate_limits` maps a logger name to (count, seconds): each distinct
+    message of that logger and its children passes at most `count` times per
+    `seconds`, and the next one to pass notes how many were suppressed.
+    `sampling` maps a logger name to the fraction of its records to keep.
+    Warnings and errors always pass.
+    """
+    def __init__(self, rate_limits=None, sampling=None):
+        super().__init__()
+        self.rate_limits = rate_limits or {}
+        self.sampling = sampling or {}
+        # (logger, message template) -> [window start, passed in window, suppressed]
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        fraction = match_rule(self.sampling, record.name)
+        if fraction is not None and random.random() >= fraction:
+            return False
+        limit = match_rule(self.rate_limits, record.name)
+        if limit is None:
+            return True
+        count, period = limit
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.setdefault((record.name, record.msg), [now, 0, 0])
+            if now - window[0] >= period:
+                window[0], window[1] = now, 0
+            if window[1] >= count:
+                window[2] += 1
+                return False
+            window[1] += 1
+            suppressed, window[2] = window[2], 0
+        if suppressed:
+            if record.args and isinstance(record.args, tuple):
+                record.msg = f"{record.msg} (%d similar messages suppressed)"
+                record.args = record.args + (suppressed,)
+            else:
+                # Without args the message is not %-formatted, so it may hold a literal "%"
+                record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the writer thread without formatting them first.
+
+    The stock QueueHandler formats each record in the calling thread, which
+    here is the event loop. Records are passed as they are instead, so the
+    message, timestamp and traceback are rendered by the writer thread; log
+    arguments should not be mutated after the call. When the queue is full
+    the record is dropped and counted rather than blocking the loop.
+    """
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def setup_logging(level="INFO", json_output=False, rate_limits=None, sampling=None, queue_size=10000, stream=None):
+    """
+    Route all logging through a bounded queue to a background writer thread.
+
+    Replaces the root logger's handlers. Returns the QueueListener, which is
+    stopped (flushing what is queued) at interpreter exit.
+    """
+    formatter = JsonFormatter() if json_output else logging.Formatter(TEXT_FORMAT)
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(formatter)
+
+    handler = QueueHandler(queue.Queue(queue_size))
+    handler.addFilter(LogLimiter(rate_limits, sampling))
+    listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    listener.start()
+
+    def stop():
+        listener.stop()
+        if handler.dropped:
+            output.handle(logging.makeLogRecord({
+                "name": __name__, "levelno": logging.WARNING, "levelname": "WARNING",
+                "msg": "Dropped %d log records because the log queue was full.", "args": (handler.dropped,),
+            }))
+    atexit.register(stop)
+    return listener
+
+def setup_logging_from_env():
+    """setup_logging configured by LOG_LEVEL, LOG_FORMAT, LOG_RATE_LIMITS, LOG_SAMPLING and LOG_QUEUE_SIZE."""
+    return setup_logging(
+        level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+        json_output=os.environ.get('LOG_FORMAT', 'text').lower() == 'json',
+        rate_limits=parse_rules(os.environ.get('LOG_RATE_LIMITS', 'flvrbot.db=20/1,flvrbot.cogs.slap=20/1'), parse_rate),
+        sampling=parse_rules(os.environ.get('LOG_SAMPLING'), float),
+        queue_size=int(os.environ.get('LOG_QUEUE_SIZE', 10000)),
+    )
@@ -0,0 +1,152 @@
+# flvrbot/metrics.py
+import bisect
+import logging
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Seconds. 3.0 is Discord's deadline for the first response to an interaction.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 3.0, 5.0, 10.0)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style, plus sum and count."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # One slot per bucket plus +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate the q-quantile by interpolating inside its bucket, like histogram_quantile()."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def over(self, threshold):
+        """Number of observations above `threshold`, which should be one of the bucket bounds."""
+        return sum(self.counts[bisect.bisect_left(self.buckets, threshold) + 1:])
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(pairs):
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}" if pairs else ""
+
+class MetricFamily:
+    """All series of one metric name, one per combination of label values."""
+    def __init__(self, name, kind, help, labelnames, buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self.series = {}
+
+    def labels(self, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        series = self.series.get(key)
+        if series is None:
+            series = Histogram(self.buckets) if self.kind == "histogram" else Counter()
+            self.series[key] = series
+        return series
+
+    def items(self):
+        """(labels dict, series) pairs."""
+        return [(dict(zip(self.labelnames, key)), series) for key, series in self.series.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, series in sorted(self.series.items()):
+            pairs = list(zip(self.labelnames, key))
+            if self.kind == "counter":
+                lines.append(f"{self.name}{format_labels(pairs)} {series.value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{format_labels(pairs + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(pairs)} {series.sum}")
+            lines.append(f"{self.name}_count{format_labels(pairs)} {series.count}")
+        return lines
+
+class Metrics:
+    def __init__(self):
+        self.families = {}
+
+    def histogram(self, name, help, labelnames, buckets=DEFAULT_BUCKETS):
+        return self.families.setdefault(name, MetricFamily(name, "histogram", help, labelnames, buckets))
+
+    def counter(self, name, help, labelnames):
+        return self.families.setdefault(name, MetricFamily(name, "counter", help, labelnames))
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        for family in self.families.values():
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+class BotMetrics(Metrics):
+    """The metrics FlvrBot records for application commands and event listeners."""
+    def __init__(self):
+        super().__init__()
+        self.command_duration = self.histogram(
+            "flvrbot_command_duration_seconds", "Time spent handling an application command.", ("command", "cog"))
+        self.command_first_response = self.histogram(
+            "flvrbot_command_first_response_seconds", "Time from receiving an application command to its first response or defer.", ("command", "cog"))
+        self.command_errors = self.counter(
+            "flvrbot_command_errors_total", "Application commands that raised an error.", ("command", "cog"))
+        self.command_unanswered = self.counter(
+            "flvrbot_command_unanswered_total", "Application commands that finished without responding.", ("command", "cog"))
+        self.listener_duration = self.histogram(
+            "flvrbot_listener_duration_seconds", "Time spent in an event listener.", ("event", "listener"))
+        self.listener_errors = self.counter(
+            "flvrbot_listener_errors_total", "Event listener calls that raised an error.", ("event", "listener"))
+
+class MetricsServer:
+    """Serves every registry in `registries` at /metrics over plain HTTP."""
+    def __init__(self, registries, host, port):
+        self.registries = registries
+        self.host = host
+        self.port = port
+        self.runner = None
+
+    async def handle(self, request):
+        text = "".join(registry.render() for registry in self.registries)
+        return web.Response(text=text, headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logger.info("Serving metrics on http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
@@ -0,0 +1,102 @@
+# flvrbot/migrations.py
+import logging
+from datetime import datetime
+from sqlalchemy import delete, func, insert, select, text, update
+from flvrbot.db import Base, Geocode, Quote, SchemaVersion, StatCounter, Stats, User, legacy_stats_data
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_xact_lock so only one process migrates at a time.
+MIGRATION_LOCK_KEY = 0x666c7672
+
+async def create_index(conn, table, name):
+    index = next(index for index in table.indexes if index.name == name)
+    await conn.run_sync(lambda sync_conn: index.create(sync_conn, checkfirst=True))
+
+async def create_base_tables(db_manager, conn):
+    await conn.run_sync(Base.metadata.create_all)
+
+async def move_legacy_stats(db_manager, conn):
+    """Fold the JSON blobs in the legacy stats table into stat_counters, then empty it."""
+    migrated = 0
+    last_id = 0
+    while True:
+        query = (select(Stats.id, Stats.guild_id, Stats.user_id, Stats.module, Stats.data)
+                 .where(Stats.id > last_id).order_by(Stats.id).limit(1000))
+        batch = (await conn.execute(query)).all()
+        if not batch:
+            break
+        counters = {}
+        for stat in batch:
+            for key, value in legacy_stats_data(stat.data).items():
+                counter_key = (stat.guild_id, stat.user_id, stat.module, key)
+                counters[counter_key] = counters.get(counter_key, 0) + int(value)
+        await db_manager.increment_counters(conn, counters)
+        migrated += len(batch)
+        last_id = batch[-1].id
+    if migrated:
+        await conn.execute(delete(Stats))
+        logger.info("Migrated %s legacy stats rows to stat_counters.", migrated)
+
+async def unique_users(db_manager, conn):
+    """Merge duplicate (guild_id, user_id) rows, then enforce uniqueness."""
+    duplicates = (await conn.execute(
+        select(User.guild_id, User.user_id, func.min(User.id), func.max(User.last_seen))
+        .group_by(User.guild_id, User.user_id)
+        .having(func.count() > 1)
+    )).all()
+    for guild_id, user_id, keep_id, last_seen in duplicates:
+        await conn.execute(update(User).where(User.id == keep_id).values(last_seen=last_seen))
+        await conn.execute(delete(User).where(User.guild_id == guild_id, User.user_id == user_id, User.id != keep_id))
+    if duplicates:
+        logger.info("Merged %s duplicated users.", len(duplicates))
+    await create_index(conn, User.__table__, 'ix_users_guild_user')
+
+async def index_stat_counters(db_manager, conn):
+    await create_index(conn, StatCounter.__table__, 'ix_stat_counters_guild_module_key')
+
+async def index_quotes(db_manager, conn):
+    await create_index(conn, Quote.__table__, 'ix_quotes_guild_id')
+
+async def quote_search_index(db_manager, conn):
+    await db_manager.quote_search.setup(conn)
+
+async def index_quotes_last_viewed(db_manager, conn):
+    # Matches the ORDER BY of get_stalest_quote. SQLite already sorts NULLs first and rejects NULLS FIRST in an index.
+    nulls_first = " NULLS FIRST" if conn.dialect.name == 'postgresql' else ""
+    await conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS ix_quotes_guild_last_viewed ON quotes (guild_id, date_last_viewed{nulls_first}, id)"
+    ))
+
+async def create_geocode_cache(db_manager, conn):
+    await conn.run_sync(lambda sync_conn: Geocode.__table__.create(sync_conn, checkfirst=True))
+
+# Append only. Every migration must be idempotent: version 1 creates fresh
+# databases from the current models, so later steps may find their work done.
+MIGRATIONS = [
+    (1, "Create base tables", create_base_tables),
+    (2, "Move legacy JSON stats into stat_counters", move_legacy_stats),
+    (3, "Unique index on users(guild_id, user_id)", unique_users),
+    (4, "Index stat_counters(guild_id, module, key)", index_stat_counters),
+    (5, "Index quotes(guild_id, id)", index_quotes),
+    (6, "Full-text search index on quotes", quote_search_index),
+    (7, "Index quotes(guild_id, date_last_viewed, id)", index_quotes_last_viewed),
+    (8, "Create geocode_cache table", create_geocode_cache),
+]
+
+async def run_migrations(db_manager):
+    engine = db_manager.engine
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: SchemaVersion.__table__.create(sync_conn, checkfirst=True))
+
+    for version, description, migration in MIGRATIONS:
+        async with engine.begin() as conn:
+            if engine.dialect.name == 'postgresql':
+                await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            applied = await conn.scalar(select(SchemaVersion.version).where(SchemaVersion.version == version))
+            if applied is not None:
+                continue
+            logger.info("Applying schema migration %s: %s", version, description)
+            await migration(db_manager, conn)
+            await conn.execute(insert(SchemaVersion).values(version=version, description=description, applied_at=datetime.utcnow()))
+    logger.info("Database schema is up to date.")
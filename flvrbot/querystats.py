@@ -0,0 +1,152 @@
+# flvrbot/querystats.py
+import contextlib
+import contextvars
+import functools
+import logging
+import time
+from collections import Counter
+from sqlalchemy import event
+from flvrbot.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+# Separate logger so slow statements can be routed or silenced on their own
+slow_logger = logging.getLogger(f"{__name__}.slow")
+
+# Finer than the command buckets: most statements take well under a millisecond on SQLite
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# The DBManager method running in the current task, and the interaction or listener it runs for.
+# SQLAlchemy runs the engine events in a greenlet that shares the caller's context, so both are visible there.
+current_method = contextvars.ContextVar("current_method", default=None)
+current_scope = contextvars.ContextVar("current_scope", default=None)
+
+def compact(statement, limit):
+    return " ".join(statement.split())[:limit]
+
+def redact(parameters):
+    """Replace bound values with their type (and length for strings) so they never reach the logs."""
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return type(parameters)(redact(value) for value in parameters)
+    if parameters is None:
+        return None
+    if isinstance(parameters, (str, bytes)):
+        return f"<{type(parameters).__name__}:{len(parameters)}>"
+    return f"<{type(parameters).__name__}>"
+
+class QueryScope:
+    """Statements issued while handling one interaction or event."""
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.statements = Counter()
+
+class QueryStats(Metrics):
+    """
+    Statement and DBManager method timings, collected from engine events.
+
+    Each statement is attributed to the innermost `instrumented` method
+    running when it executes. Statements slower than `slow_threshold` seconds
+    are logged with their parameters redacted. A scope that runs the same
+    statement `repeat_threshold` times or more is reported as a likely N+1.
+    """
+    def __init__(self, slow_threshold=0.25, repeat_threshold=10):
+        super().__init__()
+        self.slow_threshold = slow_threshold
+        self.repeat_threshold = repeat_threshold
+        self.method_duration = self.histogram(
+            "flvrbot_db_method_duration_seconds", "Time spent in a DBManager method, cache hits included.", ("method",), DB_BUCKETS)
+        self.statement_duration = self.histogram(
+            "flvrbot_db_statement_duration_seconds", "Time spent executing a statement, by the DBManager method that issued it.", ("method",), DB_BUCKETS)
+        self.rows = self.counter(
+            "flvrbot_db_rows_total", "Rows affected or returned by statements whose driver reports a row count, by the DBManager method that issued them.", ("method",))
+        self.slow_statements = self.counter(
+            "flvrbot_db_slow_statements_total", "Statements slower than the slow query threshold.", ("method",))
+        self.scope_statements = self.histogram(
+            "flvrbot_db_statements_per_scope", "Statements executed while handling one command or event.", ("scope",),
+            (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000))
+        self.repeated_statements = self.counter(
+            "flvrbot_db_repeated_statements_total", "Commands or events that ran one statement repeat_threshold times or more.", ("scope",))
+
+    def attach(self, engine):
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self.after_cursor_execute)
+        event.listen(sync_engine, "handle_error", self.handle_error)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        method = current_method.get() or "other"
+        self.statement_duration.labels(method=method).observe(elapsed)
+        # -1 when the driver doesn't know yet, e.g. for SELECTs on SQLite; those aren't counted
+        rowcount = cursor.rowcount
+        if rowcount >= 0:
+            self.rows.labels(method=method).inc(rowcount)
+        scope = current_scope.get()
+        if scope is not None:
+            scope.count += 1
+            scope.statements[statement] += 1
+        if elapsed >= self.slow_threshold:
+            self.slow_statements.labels(method=method).inc()
+            slow_logger.warning(
+                "Slow query (%.1fms, %s rows) in %s: %s parameters=%s",
+                elapsed * 1000, rowcount if rowcount >= 0 else "unknown", method, compact(statement, 500), redact(parameters)
+            )
+
+    def handle_error(self, exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+    def record_method(self, method, elapsed):
+        self.method_duration.labels(method=method).observe(elapsed)
+
+    @contextlib.contextmanager
+    def scope(self, name):
+        """Count the statements run by the current task (and tasks it starts) under `name`."""
+        scope = QueryScope(name)
+        token = current_scope.set(scope)
+        try:
+            yield scope
+        finally:
+            current_scope.reset(token)
+            self.finish_scope(scope)
+
+    def finish_scope(self, scope):
+        if not scope.count:
+            return
+        self.scope_statements.labels(scope=scope.name).observe(scope.count)
+        statement, repeats = scope.statements.most_common(1)[0]
+        if repeats >= self.repeat_threshold:
+            self.repeated_statements.labels(scope=scope.name).inc()
+            logger.warning(
+                "Possible N+1 in %s: %s statements, this one %s times: %s", scope.name, scope.count, repeats, compact(statement, 300)
+            )
+
+    def summary(self):
+        """[(method, calls, p50, p95, p99, rows)] in seconds, slowest p95 first."""
+        rows = {labels["method"]: counter.value for labels, counter in self.rows.items()}
+        result = [
+            (labels["method"], histogram.count, histogram.quantile(0.5), histogram.quantile(0.95), histogram.quantile(0.99), rows.get(labels["method"], 0))
+            for labels, histogram in self.method_duration.items()
+        ]
+        return sorted(result, key=lambda row: row[3] or 0, reverse=True)
+
+def instrumented(method):
+    """Time a DBManager method and attribute the statements it runs to it."""
+    name = method.__name__
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        token = current_method.set(name)
+        started = time.perf_counter()
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            current_method.reset(token)
+            self.query_stats.record_method(name, time.perf_counter() - started)
+    return wrapper
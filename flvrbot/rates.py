@@ -0,0 +1,116 @@
+# flvrbot/rates.py
+import abc
+import asyncio
+import json
+import logging
+import time
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+class RateSource(abc.ABC):
+    """Somewhere to get a table of exchange rates: `fetch` returns {code: units per 1 `base`}."""
+    @abc.abstractmethod
+    async def fetch(self, base):
+        ...
+
+    async def close(self):
+        pass
+
+class ExchangeRateAPISource(RateSource):
+    def __init__(self, api_url="https://api.exchangerate-api.com/v4/latest/"):
+        self.api_url = api_url
+        self.session = None
+
+    async def fetch(self, base):
+        # Created on first use so it belongs to the running event loop
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        async with self.session.get(f"{self.api_url}{base}") as response:
+            response.raise_for_status()
+            data = await response.json(content_type=None)
+        return data["rates"]
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+class FixtureRateSource(RateSource):
+    """Reads a rate table saved in the exchangerate-api format, for running offline."""
+    def __init__(self, path):
+        self.path = path
+
+    async def fetch(self, base):
+        with open(self.path) as f:
+            data = json.load(f)
+        rates = data["rates"]
+        fixture_base = data.get("base", base).upper()
+        if fixture_base != base:
+            # Rebase so the table is always relative to the store's base
+            rates = {code: rate / rates[base] for code, rate in rates.items()}
+        return rates
+
+class RateStore:
+    """
+    One base currency's rate table, kept in memory and refreshed periodically.
+
+    Any pair is converted through the base as a cross rate. `refresh` is
+    called in the background once the table is `refresh_margin` seconds away
+    from expiring; if it fails, the last table keeps being served.
+    """
+    def __init__(self, source, base="USD", refresh_interval=3600, refresh_margin=300, clock=time.monotonic):
+        self.source = source
+        self.base = base.upper()
+        self.refresh_interval = refresh_interval
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self.rates = {}
+        self.fetched_at = None
+        self.updated = None
+        self.lock = asyncio.Lock()
+
+    def due(self):
+        return self.fetched_at is None or self.clock() - self.fetched_at >= self.refresh_interval - self.refresh_margin
+
+    def stale(self):
+        return self.fetched_at is None or self.clock() - self.fetched_at >= self.refresh_interval
+
+    async def refresh(self, force=False):
+        async with self.lock:
+            # Somebody else may have refreshed while we waited for the lock
+            if not force and not self.due():
+                return True
+            try:
+                rates = await self.source.fetch(self.base)
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError, KeyError, ValueError) as e:
+                logger.error("Failed to refresh %s exchange rates: %s", self.base, e)
+                return False
+            self.rates = {code.upper(): float(rate) for code, rate in rates.items() if rate}
+            self.rates[self.base] = 1.0
+            self.fetched_at = self.clock()
+            self.updated = time.time()
+            logger.debug("Loaded %s %s exchange rates.", len(self.rates), self.base)
+            return True
+
+    async def ensure_loaded(self):
+        if not self.rates:
+            await self.refresh()
+        return bool(self.rates)
+
+    def rate(self, from_code, to_code):
+        """Return how many `to_code` one `from_code` buys, or None if either is unknown."""
+        from_rate = self.rates.get(from_code.upper())
+        to_rate = self.rates.get(to_code.upper())
+        if from_rate is None or to_rate is None:
+            return None
+        return to_rate / from_rate
+
+    def convert(self, value, from_code, to_code):
+        rate = self.rate(from_code, to_code)
+        return None if rate is None else value * rate
+
+    def codes(self):
+        return sorted(self.rates)
+
+    async def close(self):
+        await self.source.close()
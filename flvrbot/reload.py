@@ -0,0 +1,116 @@
+# flvrbot/reload.py
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+class ReloadManager:
+    """
+    Reloads extensions in place when their source changes, without restarting the bot.
+
+    `poll` compares the modification times of the custom cogs directory with
+    the last scan. Changed files are reloaded, new files loaded and deleted
+    files unloaded. A reload that fails leaves the previous version running:
+    py-cord's reload_extension restores the old module when the new one
+    fails to import or set up.
+    """
+    def __init__(self, bot, cog_loader, directory='/app/cogs', package='cogs'):
+        self.bot = bot
+        self.cog_loader = cog_loader
+        self.directory = directory
+        self.package = package
+        self.lock = asyncio.Lock()
+        self.mtimes = self.scan()
+
+    def scan(self):
+        mtimes = {}
+        if not os.path.isdir(self.directory):
+            return mtimes
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.py') and filename != '__init__.py':
+                try:
+                    mtimes[f'{self.package}.{filename[:-3]}'] = os.stat(os.path.join(self.directory, filename)).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+        return mtimes
+
+    def resolve(self, name):
+        """Accept a full extension name or just its last part, e.g. `weather` for `flvrbot.cogs.weather`."""
+        if name in self.bot.extensions:
+            return name
+        matches = [extension for extension in self.bot.extensions if extension.rsplit('.', 1)[-1] == name]
+        return matches[0] if len(matches) == 1 else name
+
+    async def poll(self):
+        """Reload whatever changed since the last scan. Returns {extension: error or None}."""
+        current = self.scan()
+        changed = [name for name, mtime in current.items() if self.mtimes.get(name) != mtime]
+        removed = [name for name in self.mtimes if name not in current]
+        self.mtimes = current
+        results = {}
+        for name in changed:
+            results[name] = await self.reload(name, sync=False)
+        for name in removed:
+            results[name] = await self.unload(name, sync=False)
+        if any(error is None for error in results.values()):
+            await self.sync()
+        return results
+
+    async def reload(self, name, sync=True):
+        """Reload `name`, or load it if it isn't loaded yet. Returns None on success or the error."""
+        async with self.lock:
+            error = None
+            previous = self.module_cogs(name)
+            try:
+                if name in self.bot.extensions:
+                    self.bot.reload_extension(name)
+                else:
+                    self.bot.load_extension(name)
+                logger.info("Reloaded cog module: %s", name)
+            except Exception as e:
+                logger.error("Failed to reload cog module: %s, keeping the previous version. Error: %s", name, e)
+                error = e
+            await self.shut_down(previous)
+            # Either the new version or the restored old one is a fresh instance that hasn't run startup()
+            for cog in self.module_cogs(name):
+                if not self.cog_loader.is_lazy(name):
+                    await self.cog_loader.initialize_cog(cog)
+        if sync and error is None:
+            await self.sync()
+        return error
+
+    async def unload(self, name, sync=True):
+        async with self.lock:
+            if name not in self.bot.extensions:
+                return None
+            cogs = self.module_cogs(name)
+            try:
+                self.bot.unload_extension(name)
+                logger.info("Unloaded cog module: %s", name)
+            except Exception as e:
+                logger.error("Failed to unload cog module: %s. Error: %s", name, e)
+                return e
+            await self.shut_down(cogs)
+        if sync:
+            await self.sync()
+        return None
+
+    async def shut_down(self, cogs):
+        # py-cord has already removed these instances; let them persist buffered state like FlvrBot.close does
+        for cog in cogs:
+            self.cog_loader.initialized.discard(cog.qualified_name)
+            shutdown = getattr(cog, "shutdown", None)
+            if shutdown is not None:
+                try:
+                    await shutdown()
+                except Exception as e:
+                    logger.error("Shutdown of cog %s failed: %s", cog.qualified_name, e, exc_info=True)
+
+    def module_cogs(self, name):
+        return [cog for cog in self.bot.cogs.values() if cog.__module__ == name]
+
+    async def sync(self):
+        # Only possible once connected; commands are synced on connect anyway
+        if self.bot.is_ready():
+            await self.bot.sync_commands()
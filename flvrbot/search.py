@@ -0,0 +1,209 @@
+# flvrbot/search.py
+import abc
+import asyncio
+import logging
+import math
+import re
+import sqlite3
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(value):
+    return [token.lower() for token in TOKEN_PATTERN.findall(value)]
+
+class QuoteSearch(abc.ABC):
+    """
+    Full-text search over quotes.
+
+    `setup` runs once from the schema migrations, `index` and `remove` run
+    inside the add_quote and delete_quote transactions, and `search` returns
+    the ids of the best matching quotes in a guild, most relevant first.
+    """
+    async def setup(self, conn):
+        pass
+
+    async def index(self, session, quote_id, guild_id, message):
+        pass
+
+    async def remove(self, session, quote_id, guild_id, message):
+        pass
+
+    @abc.abstractmethod
+    async def search(self, session, guild_id, query, limit):
+        ...
+
+class SQLiteQuoteSearch(QuoteSearch):
+    """FTS5 external content table over quotes.message, ranked with bm25."""
+    async def setup(self, conn):
+        await conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS quotes_fts "
+            "USING fts5(message, content='quotes', content_rowid='id')"
+        ))
+        await conn.execute(text("INSERT INTO quotes_fts(quotes_fts) VALUES ('rebuild')"))
+
+    async def index(self, session, quote_id, guild_id, message):
+        await session.execute(
+            text("INSERT INTO quotes_fts(rowid, message) VALUES (:id, :message)"),
+            {"id": quote_id, "message": message},
+        )
+
+    async def remove(self, session, quote_id, guild_id, message):
+        await session.execute(
+            text("INSERT INTO quotes_fts(quotes_fts, rowid, message) VALUES ('delete', :id, :message)"),
+            {"id": quote_id, "message": message},
+        )
+
+    async def search(self, session, guild_id, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # Quote every token so user input can never be read as FTS5 syntax; '*' makes each a prefix match.
+        match = " ".join(f'"{token}"*' for token in tokens)
+        result = await session.execute(
+            text(
+                "SELECT quotes.id FROM quotes_fts JOIN quotes ON quotes.id = quotes_fts.rowid "
+                "WHERE quotes_fts MATCH :match AND quotes.guild_id = :guild_id "
+                "ORDER BY bm25(quotes_fts) LIMIT :limit"
+            ),
+            {"match": match, "guild_id": guild_id, "limit": limit},
+        )
+        return [row[0] for row in result.all()]
+
+class PostgresQuoteSearch(QuoteSearch):
+    """Generated tsvector column on quotes with a GIN index, ranked with ts_rank."""
+    async def setup(self, conn):
+        await conn.execute(text(
+            "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('english', message)) STORED"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_quotes_search_vector ON quotes USING GIN (search_vector)"
+        ))
+
+    async def search(self, session, guild_id, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        tsquery = " & ".join(f"{token}:*" for token in tokens)
+        result = await session.execute(
+            text(
+                "SELECT id FROM quotes, to_tsquery('english', :tsquery) AS query "
+                "WHERE guild_id = :guild_id AND search_vector @@ query "
+                "ORDER BY ts_rank(search_vector, query) DESC, id LIMIT :limit"
+            ),
+            {"tsquery": tsquery, "guild_id": guild_id, "limit": limit},
+        )
+        return [row[0] for row in result.all()]
+
+class InvertedIndexQuoteSearch(QuoteSearch):
+    """
+    Pure Python fallback for databases without a full-text engine.
+
+    Each guild's postings ({token: {quote_id: term_frequency}}) are built from
+    the database on its first search and kept current by index/remove. Only
+    one build runs per guild, and its postings are published once complete.
+    """
+    def __init__(self):
+        self.guilds = {}
+        self.load_locks = {}
+        # guild_id -> [(added, quote_id, message)] seen by index/remove while that guild's build runs
+        self.changes_during_load = {}
+
+    @staticmethod
+    def add_postings(postings, quote_id, message):
+        for token in tokenize(message):
+            entry = postings.setdefault(token, {})
+            entry[quote_id] = entry.get(quote_id, 0) + 1
+
+    @staticmethod
+    def remove_postings(postings, quote_id, message):
+        for token in set(tokenize(message)):
+            entry = postings.get(token)
+            if entry is not None:
+                entry.pop(quote_id, None)
+                if not entry:
+                    del postings[token]
+
+    async def index(self, session, quote_id, guild_id, message):
+        if guild_id in self.changes_during_load:
+            self.changes_during_load[guild_id].append((True, quote_id, message))
+        elif guild_id in self.guilds:
+            self.add_postings(self.guilds[guild_id], quote_id, message)
+
+    async def remove(self, session, quote_id, guild_id, message):
+        if guild_id in self.changes_during_load:
+            self.changes_during_load[guild_id].append((False, quote_id, message))
+        elif guild_id in self.guilds:
+            self.remove_postings(self.guilds[guild_id], quote_id, message)
+
+    async def load(self, session, guild_id):
+        lock = self.load_locks.setdefault(guild_id, asyncio.Lock())
+        async with lock:
+            if guild_id in self.guilds:
+                return
+            self.changes_during_load[guild_id] = []
+            try:
+                rows = (await session.execute(
+                    text("SELECT id, message FROM quotes WHERE guild_id = :guild_id"), {"guild_id": guild_id}
+                )).all()
+            finally:
+                changes = self.changes_during_load.pop(guild_id)
+            postings = {}
+            loaded = set()
+            for quote_id, message in rows:
+                self.add_postings(postings, quote_id, message)
+                loaded.add(quote_id)
+            # A change the read already saw is not applied twice
+            for added, quote_id, message in changes:
+                if added and quote_id not in loaded:
+                    self.add_postings(postings, quote_id, message)
+                    loaded.add(quote_id)
+                elif not added and quote_id in loaded:
+                    self.remove_postings(postings, quote_id, message)
+                    loaded.discard(quote_id)
+            self.guilds[guild_id] = postings
+
+    async def search(self, session, guild_id, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        if guild_id not in self.guilds:
+            await self.load(session, guild_id)
+        postings = self.guilds[guild_id]
+        document_count = len({quote_id for entry in postings.values() for quote_id in entry}) or 1
+
+        scores = None
+        for token in tokens:
+            token_scores = {}
+            for candidate, entry in postings.items():
+                if not candidate.startswith(token):
+                    continue
+                idf = math.log(1 + document_count / len(entry))
+                for quote_id, frequency in entry.items():
+                    token_scores[quote_id] = token_scores.get(quote_id, 0) + frequency * idf
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {quote_id: score + token_scores[quote_id] for quote_id, score in scores.items() if quote_id in token_scores}
+            if not scores:
+                return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [quote_id for quote_id, score in ranked[:limit]]
+
+def sqlite_has_fts5():
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE fts5_probe USING fts5(content)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+def make_quote_search(dialect_name):
+    if dialect_name == 'postgresql':
+        return PostgresQuoteSearch()
+    if dialect_name == 'sqlite' and sqlite_has_fts5():
+        return SQLiteQuoteSearch()
+    logger.info("No full-text engine for %s, using the in-memory quote index.", dialect_name)
+    return InvertedIndexQuoteSearch()
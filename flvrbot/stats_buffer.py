@@ -0,0 +1,89 @@
+# flvrbot/stats_buffer.py
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+class UserActivityBuffer:
+    """
+    Aggregates per-message user activity in memory and writes it to the
+    database in one bulk transaction.
+
+    Message and character counts are summed and only the latest last_seen is
+    kept per (guild_id, user_id), so a flush costs the same whether a user
+    sent one message or a thousand.
+    """
+    def __init__(self, db_manager, max_entries=None):
+        self.db_manager = db_manager
+        self.max_entries = max_entries or int(os.environ.get('STATS_FLUSH_SIZE', 500))
+        self.pending = {}
+        # Entries taken by the flush in progress, until they are committed or restored
+        self.flushing = {}
+        self.flush_lock = asyncio.Lock()
+        self.flush_task = None
+
+    def __len__(self):
+        return len(self.pending)
+
+    def record(self, guild_id, user_id, joined_guild, characters, last_seen):
+        entry = self.pending.get((guild_id, user_id))
+        if entry is None:
+            entry = self.pending[(guild_id, user_id)] = {
+                "joined_guild": joined_guild,
+                "messages": 0,
+                "characters": 0,
+                "last_seen": last_seen,
+            }
+        entry["messages"] += 1
+        entry["characters"] += characters
+        if last_seen is not None and (entry["last_seen"] is None or last_seen > entry["last_seen"]):
+            entry["last_seen"] = last_seen
+
+        if len(self.pending) >= self.max_entries and (self.flush_task is None or self.flush_task.done()):
+            self.flush_task = asyncio.create_task(self.flush())
+
+    def unflushed(self, guild_id, user_id):
+        """
+        A user's activity that is not in the database yet, or None.
+
+        Counts both the buffer and a flush in progress, so a command can add
+        it to what it reads instead of flushing first.
+        """
+        entries = [entry for entry in (self.flushing.get((guild_id, user_id)), self.pending.get((guild_id, user_id))) if entry]
+        if not entries:
+            return None
+        seen = [entry["last_seen"] for entry in entries if entry["last_seen"] is not None]
+        return {
+            "joined_guild": entries[0]["joined_guild"],
+            "messages": sum(entry["messages"] for entry in entries),
+            "characters": sum(entry["characters"] for entry in entries),
+            "last_seen": max(seen) if seen else None,
+        }
+
+    def restore(self, entries):
+        """Merge entries from a failed flush back into the buffer so they are retried."""
+        for key, entry in entries.items():
+            current = self.pending.get(key)
+            if current is None:
+                self.pending[key] = entry
+                continue
+            current["messages"] += entry["messages"]
+            current["characters"] += entry["characters"]
+            if entry["last_seen"] is not None and (current["last_seen"] is None or entry["last_seen"] > current["last_seen"]):
+                current["last_seen"] = entry["last_seen"]
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.pending:
+                return
+            entries, self.pending = self.pending, {}
+            self.flushing = entries
+            try:
+                await self.db_manager.apply_user_activity(entries)
+                logger.debug("Flushed activity for %s users.", len(entries))
+            except Exception as e:
+                logger.error("Failed to flush user activity, will retry: %s", e)
+                self.restore(entries)
+            finally:
+                self.flushing = {}
@@ -0,0 +1,123 @@
+# flvrbot/units.py
+import asyncio
+import bisect
+import itertools
+import logging
+import math
+import threading
+import time
+from flvrbot.cache import MISSING, TTLCache
+
+logger = logging.getLogger(__name__)
+
+FAHRENHEIT_NAMES = ("f", "fahrenheit", "F", "degree_Fahrenheit")
+CELSIUS_NAMES = ("c", "celsius", "C", "degree_Celsius")
+
+# pint accepts any prefix on any unit, so there is no list of prefixed units to index; these are the ones people type
+COMMON_PREFIXED_UNITS = (
+    "km cm mm um nm kg mg ug mL cL kL kW MW GW kWh kJ MJ kcal kPa hPa MPa kHz MHz GHz kB MB GB TB ms us ns mA kV mV kN "
+    "kilometer centimeter millimeter micrometer nanometer kilogram milligram microgram milliliter centiliter kilowatt "
+    "megawatt kilowatt_hour kilojoule kilocalorie kilopascal hectopascal kilohertz megahertz gigahertz kilobyte "
+    "megabyte gigabyte terabyte millisecond microsecond nanosecond milliampere kilovolt millivolt kilonewton"
+).split()
+
+class UnitConverter:
+    """
+    Unit conversions backed by a pint registry that is only built when needed.
+
+    Nearly every conversion is affine, y = scale * x + offset, so the first
+    conversion of a (unit_from, unit_to) pair asks pint for scale and offset
+    and later ones are plain arithmetic. Pairs that turn out not to be affine
+    (logarithmic units such as decibels) always go through pint.
+    """
+    def __init__(self, cache_size=1024):
+        self.registry = None
+        self.load_lock = threading.Lock()
+        # Unit definitions never change, so entries only leave the table when it is full
+        self.factors = TTLCache(cache_size, math.inf)
+        self.unit_index = []
+
+    def load(self):
+        """Build the registry and the autocomplete index. Blocking; safe to call from a thread."""
+        with self.load_lock:
+            if self.registry is not None:
+                return self.registry
+            import pint
+            started = time.perf_counter()
+            registry = pint.UnitRegistry()
+            # dir() lists every unit name, symbol and alias, next to the registry's own attributes
+            names = [name for name in dir(registry) + COMMON_PREFIXED_UNITS if self.is_unit(registry, name)]
+            self.unit_index = sorted({(name.lower(), name) for name in names})
+            self.registry = registry
+            logger.info("Built unit registry with %s names in %.2fs", len(self.unit_index), time.perf_counter() - started)
+            return registry
+
+    @staticmethod
+    def is_unit(registry, name):
+        # Public API; an empty result means pint can't read `name` as a unit, with or without a prefix
+        return bool(registry.parse_unit_name(name))
+
+    async def ensure_loaded(self):
+        if self.registry is None:
+            await asyncio.to_thread(self.load)
+        return self.registry
+
+    def resolve(self, unit_from, unit_to):
+        """Apply the temperature shorthands (f/c) /convert has always accepted."""
+        if unit_from in FAHRENHEIT_NAMES and unit_to in CELSIUS_NAMES:
+            return "degree_Fahrenheit", "degree_Celsius", "Fahrenheit", "Celsius"
+        if unit_from in CELSIUS_NAMES and unit_to in FAHRENHEIT_NAMES:
+            return "degree_Celsius", "degree_Fahrenheit", "Celsius", "Fahrenheit"
+        return unit_from, unit_to, None, None
+
+    def conversion(self, unit_from, unit_to):
+        """
+        Return (scale, offset, friendly_from, friendly_to) for a pair; scale is None if it isn't affine.
+
+        Raises RuntimeError if the registry has not been built: building it
+        blocks, so callers on the event loop await ensure_loaded() first.
+        """
+        key = (unit_from, unit_to)
+        cached = self.factors.get(key)
+        if cached is not MISSING:
+            return cached
+        registry = self.registry
+        if registry is None:
+            raise RuntimeError("The unit registry is not loaded yet")
+        pint_from, pint_to, friendly_from, friendly_to = self.resolve(unit_from, unit_to)
+        source = registry.Quantity(0, pint_from)
+        zero = source.to(pint_to)
+        one = registry.Quantity(1, pint_from).to(pint_to)
+        offset = zero.magnitude
+        scale = one.magnitude - offset
+        probe = registry.Quantity(10, pint_from).to(pint_to).magnitude
+        if not math.isclose(probe, scale * 10 + offset, rel_tol=1e-9, abs_tol=1e-12):
+            scale = offset = None
+        result = (scale, offset, friendly_from or str(source.units), friendly_to or str(zero.units))
+        self.factors.set(key, result)
+        return result
+
+    def convert(self, value, unit_from, unit_to):
+        """Return (converted value, friendly_from, friendly_to). Raises pint's errors for bad units."""
+        scale, offset, friendly_from, friendly_to = self.conversion(unit_from, unit_to)
+        if scale is None:
+            pint_from, pint_to, _, _ = self.resolve(unit_from, unit_to)
+            return self.registry.Quantity(value, pint_from).to(pint_to).magnitude, friendly_from, friendly_to
+        return value * scale + offset, friendly_from, friendly_to
+
+    def complete(self, prefix, limit=25):
+        """
+        Unit names, symbols and aliases starting with `prefix` (case-insensitive).
+
+        `prefix` itself comes first when pint understands it as a unit, which
+        covers prefixed units such as "dam" that are not indexed.
+        """
+        matches = [prefix] if prefix and self.registry is not None and self.is_unit(self.registry, prefix) else []
+        lowered_prefix = prefix.lower()
+        start = bisect.bisect_left(self.unit_index, (lowered_prefix,))
+        for lowered, name in itertools.islice(self.unit_index, start, None):
+            if not lowered.startswith(lowered_prefix) or len(matches) >= limit:
+                break
+            if name != prefix:
+                matches.append(name)
+        return matches
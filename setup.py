@@ -6,9 +6,11 @@ setup(
     packages=find_packages(),
     install_requires=[
         'aiohttp==3.9.3',
+        'aiosqlite==0.20.0',
         'aiosignal==1.3.1',
         'async-timeout==4.0.3',
         'asyncio==3.4.3',
+        'asyncpg==0.29.0',
         'attrs==23.2.0',
         'python-dateutil',
         'certifi==2024.2.2',
@@ -19,10 +21,9 @@ setup(
         'idna==3.6',
         'lenny==0.1.3',
         'multidict==6.0.5',
-        'psycopg2-binary==2.9.9',
         'py-cord==2.5.0',
         'pytz==2024.1',
-        'requests==2.31.0',
+        'sortedcontainers==2.4.0',
         'SQLAlchemy==2.0.29',
         'typing_extensions==4.10.0',
         'urllib3==2.2.1',